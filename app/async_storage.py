@@ -0,0 +1,264 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Protocol, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.storage import SortKey, storage
+
+
+class AsyncHighlightStore(Protocol):
+    """Awaitable storage interface used by the API routes"""
+
+    async def count(
+        self,
+        owner_id: str,
+        tag: Optional[str] = None,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> int: ...
+
+    async def version(self, owner_id: str) -> int: ...
+
+    async def tag_counts(self, owner_id: str) -> Dict[str, int]: ...
+
+    async def source_stats(self, owner_id: str) -> List[dict]: ...
+
+    async def get_page(
+        self,
+        owner_id: str,
+        limit: int,
+        after: Optional[SortKey] = None,
+        tag: Optional[str] = None,
+        newest_first: bool = True,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[Sequence[dict], bool]: ...
+
+    async def get_all(
+        self,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Sequence[dict]: ...
+
+    async def get_by_id(
+        self,
+        highlight_id: int,
+        owner_id: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[dict]: ...
+
+    async def get_by_tag(
+        self,
+        tag: str,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Sequence[dict]: ...
+
+    async def search(
+        self, query: str, owner_id: str, limit: int = 20, partial: bool = False
+    ) -> Sequence[dict]: ...
+
+    async def create(
+        self, text: str, source: str, tags: List[str], owner_id: str
+    ) -> dict: ...
+
+    async def create_unique(
+        self, text: str, source: str, tags: List[str], owner_id: str
+    ) -> Tuple[dict, bool]: ...
+
+    async def create_many(self, items: List[dict], owner_id: str) -> List[dict]: ...
+
+    async def update(
+        self, highlight_id: int, update_data: dict, owner_id: Optional[str] = None
+    ) -> Optional[dict]: ...
+
+    async def delete(
+        self, highlight_id: int, owner_id: Optional[str] = None
+    ) -> Optional[dict]: ...
+
+    async def rename_tag(self, owner_id: str, tag: str, new_tag: str) -> int: ...
+
+    async def remove_tag(self, owner_id: str, tag: str) -> int: ...
+
+    async def delete_by_tag(self, owner_id: str, tag: str) -> int: ...
+
+
+class AsyncStorageAdapter:
+    """Exposes a synchronous storage engine through AsyncHighlightStore.
+
+    Engines that do I/O (``blocking = True``) are run in the thread pool; the
+    in-memory engine answers in microseconds, so it is called inline and never
+    occupies a worker thread.
+    """
+
+    def __init__(self, engine: Any):
+        self.engine = engine
+
+    async def _run(self, method: Callable, *args: Any, **kwargs: Any) -> Any:
+        if getattr(self.engine, "blocking", True):
+            return await run_in_threadpool(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    async def count(
+        self,
+        owner_id: str,
+        tag: Optional[str] = None,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> int:
+        return await self._run(
+            self.engine.count,
+            owner_id,
+            tag=tag,
+            source=source,
+            created_from=created_from,
+            created_to=created_to,
+        )
+
+    async def version(self, owner_id: str) -> int:
+        return await self._run(self.engine.version, owner_id)
+
+    async def tag_counts(self, owner_id: str) -> Dict[str, int]:
+        return await self._run(self.engine.tag_counts, owner_id)
+
+    async def source_stats(self, owner_id: str) -> List[dict]:
+        return await self._run(self.engine.source_stats, owner_id)
+
+    async def get_page(
+        self,
+        owner_id: str,
+        limit: int,
+        after: Optional[SortKey] = None,
+        tag: Optional[str] = None,
+        newest_first: bool = True,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[Sequence[dict], bool]:
+        return await self._run(
+            self.engine.get_page,
+            owner_id,
+            limit,
+            after=after,
+            tag=tag,
+            newest_first=newest_first,
+            source=source,
+            created_from=created_from,
+            created_to=created_to,
+            fields=fields,
+        )
+
+    async def get_all(
+        self,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Sequence[dict]:
+        return await self._run(
+            self.engine.get_all,
+            owner_id,
+            newest_first=newest_first,
+            source=source,
+            created_from=created_from,
+            created_to=created_to,
+            fields=fields,
+        )
+
+    async def get_by_id(
+        self,
+        highlight_id: int,
+        owner_id: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[dict]:
+        return await self._run(
+            self.engine.get_by_id, highlight_id, owner_id=owner_id, fields=fields
+        )
+
+    async def get_by_tag(
+        self,
+        tag: str,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Sequence[dict]:
+        return await self._run(
+            self.engine.get_by_tag,
+            tag,
+            owner_id=owner_id,
+            newest_first=newest_first,
+            source=source,
+            created_from=created_from,
+            created_to=created_to,
+            fields=fields,
+        )
+
+    async def search(
+        self, query: str, owner_id: str, limit: int = 20, partial: bool = False
+    ) -> Sequence[dict]:
+        return await self._run(
+            self.engine.search, query, owner_id=owner_id, limit=limit, partial=partial
+        )
+
+    async def create(
+        self, text: str, source: str, tags: List[str], owner_id: str
+    ) -> dict:
+        return await self._run(
+            self.engine.create, text=text, source=source, tags=tags, owner_id=owner_id
+        )
+
+    async def create_unique(
+        self, text: str, source: str, tags: List[str], owner_id: str
+    ) -> Tuple[dict, bool]:
+        return await self._run(
+            self.engine.create_unique,
+            text=text,
+            source=source,
+            tags=tags,
+            owner_id=owner_id,
+        )
+
+    async def create_many(self, items: List[dict], owner_id: str) -> List[dict]:
+        return await self._run(self.engine.create_many, items, owner_id=owner_id)
+
+    async def update(
+        self, highlight_id: int, update_data: dict, owner_id: Optional[str] = None
+    ) -> Optional[dict]:
+        return await self._run(
+            self.engine.update, highlight_id, update_data, owner_id=owner_id
+        )
+
+    async def delete(
+        self, highlight_id: int, owner_id: Optional[str] = None
+    ) -> Optional[dict]:
+        return await self._run(self.engine.delete, highlight_id, owner_id=owner_id)
+
+    async def rename_tag(self, owner_id: str, tag: str, new_tag: str) -> int:
+        return await self._run(self.engine.rename_tag, owner_id, tag, new_tag)
+
+    async def remove_tag(self, owner_id: str, tag: str) -> int:
+        return await self._run(self.engine.remove_tag, owner_id, tag)
+
+    async def delete_by_tag(self, owner_id: str, tag: str) -> int:
+        return await self._run(self.engine.delete_by_tag, owner_id, tag)
+
+
+async_storage: AsyncHighlightStore = AsyncStorageAdapter(storage)
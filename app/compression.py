@@ -0,0 +1,182 @@
+"""Response compression as a pure ASGI middleware.
+
+Bodies are compressed chunk by chunk as the app sends them, so streaming
+responses stay streaming: every chunk is flushed to the client as soon as it
+has been compressed. zstd is offered when the ``zstandard`` package is
+installed, gzip always.
+"""
+
+import zlib
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+DEFAULT_MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Content-type prefix -> smallest body worth compressing. Types that match no
+# rule (images, already compressed uploads) are sent as they are.
+DEFAULT_RULES: Dict[str, int] = {
+    "application/json": DEFAULT_MINIMUM_SIZE,
+    "application/problem+json": DEFAULT_MINIMUM_SIZE,
+    "application/x-ndjson": 0,
+    "text/": DEFAULT_MINIMUM_SIZE,
+}
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        mode = (
+            zstandard.COMPRESSOBJ_FLUSH_FINISH
+            if final
+            else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+ENCODERS: Dict[str, Callable[[], Any]] = {"gzip": _Gzip}
+if ZSTD_AVAILABLE:
+    ENCODERS = {"zstd": _Zstd, **ENCODERS}
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding the client accepts (q > 0), in ENCODERS order.
+
+    A coding refused with ``q=0`` stays refused even when ``*`` is accepted.
+    """
+    accepted = set()
+    refused = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    refused.add(name.strip())
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    for encoding in ENCODERS:
+        if encoding in refused:
+            continue
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Compress responses whose content type has a rule in ``rules``.
+
+    A body sent in one piece is compressed only when it reaches the rule's
+    minimum size; a streamed body is compressed from its first chunk because
+    its length is not known up front.
+    """
+
+    def __init__(self, app: ASGIApp, rules: Optional[Mapping[str, int]] = None):
+        self.app = app
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self.rules, encoding, send)(self.app, scope, receive)
+
+
+def _minimum_size(rules: Mapping[str, int], content_type: str) -> Optional[int]:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    matches = [prefix for prefix in rules if media_type.startswith(prefix)]
+    return rules[max(matches, key=len)] if matches else None
+
+
+class _CompressedResponse:
+    """send() wrapper deciding on the first body chunk whether to compress"""
+
+    def __init__(self, rules: Mapping[str, int], encoding: str, send: Send):
+        self.rules = rules
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.encoder: Any = None
+        self.passthrough = False
+
+    async def __call__(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        await app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not self._should_compress(start, len(body), more_body):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.encoder = ENCODERS[self.encoding]()
+            compressed = self.encoder.compress(body, final=not more_body)
+            await self.send(self._compressed_start(start, compressed, more_body))
+        else:
+            compressed = self.encoder.compress(body, final=not more_body)
+        await self.send(
+            {"type": "http.response.body", "body": compressed, "more_body": more_body}
+        )
+
+    def _should_compress(self, start: Message, size: int, more_body: bool) -> bool:
+        headers = Headers(raw=start["headers"])
+        if "content-encoding" in headers or start["status"] in (204, 304):
+            return False
+        minimum = _minimum_size(self.rules, headers.get("content-type", ""))
+        if minimum is None:
+            return False
+        return more_body or size >= minimum
+
+    def _compressed_start(
+        self, start: Message, compressed: bytes, more_body: bool
+    ) -> Message:
+        headers = MutableHeaders(raw=list(start["headers"]))
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(compressed))
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # The compressed bytes differ from the identity ones, so a strong
+            # ETag would claim byte equality that no longer holds.
+            headers["ETag"] = f"W/{etag}"
+        return {**start, "headers": headers.raw}
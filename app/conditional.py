@@ -0,0 +1,33 @@
+"""Conditional GET for owner-scoped reads.
+
+ETags are derived from the owner's storage version alone, so a matching
+``If-None-Match`` is answered with 304 before any highlight is loaded.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+
+def owner_etag(owner_id: str, version: int) -> str:
+    """Weak ETag: one version covers every encoding and projection of the data"""
+    digest = hashlib.blake2b(f"{owner_id}:{version}".encode(), digest_size=8)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether ``If-None-Match`` lists ``etag`` (weak comparison, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -7,6 +7,11 @@ from typing import Optional
 class Config:
     def __init__(self):
         self.database_url = self._get_secret("DATABASE_URL", required=False)
+        self.journal_dir = os.getenv("JOURNAL_DIR")
+        self.journal_fsync_interval_ms = int(
+            os.getenv("JOURNAL_FSYNC_INTERVAL_MS", "50")
+        )
+        self.journal_snapshot_every = int(os.getenv("JOURNAL_SNAPSHOT_EVERY", "10000"))
 
         env = os.getenv("ENVIRONMENT", "development")
         self.secret_key = self._get_secret("SECRET_KEY", required=(env == "production"))
@@ -6,6 +6,30 @@ from starlette.responses import JSONResponse
 from app.middleware import get_correlation_id
 
 
+class IdempotencyError(Exception):
+    def __init__(self, code: str, message: str, status: int):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+    @classmethod
+    def key_reused(cls) -> "IdempotencyError":
+        return cls(
+            "idempotency_key_reused",
+            "Idempotency-Key was already used with a different request",
+            422,
+        )
+
+    @classmethod
+    def in_progress(cls) -> "IdempotencyError":
+        return cls(
+            "request_in_progress",
+            "A request with this Idempotency-Key is still being processed",
+            409,
+        )
+
+
 def problem(
     status: int,
     title: str,
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+from app.config import config
+from app.errors import IdempotencyError
+from app.shared_state import SQLiteIdempotencyCache, shared_path
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10_000
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "status_code", "body")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.status_code: Optional[int] = None
+        self.body: Any = None
+
+
+def fingerprint(payload: Any) -> str:
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class IdempotencyCache:
+    """Responses of completed requests per (owner, Idempotency-Key).
+
+    LRU-bounded to ``max_entries`` and expired after ``ttl`` seconds. A key
+    is reserved when its request starts, so a retry that arrives while the
+    first attempt is still running is refused instead of writing twice.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+
+    def begin(self, owner_id: str, key: str, request_hash: str) -> Optional[_Entry]:
+        """Completed entry to replay, or None after reserving the key"""
+        now = self._clock()
+        cache_key = (owner_id, key)
+        entry = self._entries.get(cache_key)
+        if entry is not None and entry.expires_at <= now:
+            del self._entries[cache_key]
+            entry = None
+
+        if entry is None:
+            self._entries[cache_key] = _Entry(request_hash, now + self.ttl)
+            self._evict()
+            return None
+        if entry.fingerprint != request_hash:
+            raise IdempotencyError.key_reused()
+        if entry.status_code is None:
+            raise IdempotencyError.in_progress()
+        self._entries.move_to_end(cache_key)
+        return entry
+
+    def complete(self, owner_id: str, key: str, status_code: int, body: Any) -> None:
+        entry = self._entries.get((owner_id, key))
+        if entry is not None:
+            entry.status_code = status_code
+            entry.body = body
+
+    def abandon(self, owner_id: str, key: str) -> None:
+        entry = self._entries.get((owner_id, key))
+        if entry is not None and entry.status_code is None:
+            del self._entries[(owner_id, key)]
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def create_idempotency_cache(database_url: Optional[str] = None):
+    """Per-process LRU, or a table shared by all workers for a SQLite file"""
+    path = shared_path(database_url)
+    if path:
+        return SQLiteIdempotencyCache(
+            path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS
+        )
+    return IdempotencyCache()
+
+
+idempotency_cache = create_idempotency_cache(config.database_url)
+
+
+async def _call(method: Callable[..., Any], *args: Any) -> Any:
+    if idempotency_cache.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+async def run_idempotent(
+    owner_id: str,
+    key: Optional[str],
+    payload: Dict[str, Any],
+    response: Response,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int,
+) -> Any:
+    """Run ``handler`` once per (owner, key); replays return the cached result.
+
+    Failed attempts are not cached, so the client can retry them. Results
+    are kept in their JSON form, which the route's response_model turns back
+    into the same response on replay.
+    """
+    if key is None:
+        return await handler()
+
+    cached = await _call(idempotency_cache.begin, owner_id, key, fingerprint(payload))
+    if cached is not None:
+        response.status_code = cached.status_code
+        response.headers[REPLAY_HEADER] = "true"
+        return cached.body
+
+    try:
+        result = await handler()
+    except BaseException:
+        await _call(idempotency_cache.abandon, owner_id, key)
+        raise
+    await _call(
+        idempotency_cache.complete,
+        owner_id,
+        key,
+        response.status_code or status_code,
+        jsonable_encoder(result),
+    )
+    return result
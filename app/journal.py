@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_GLOB = "journal-*.log"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot journal {type(value).__name__}")
+
+
+def _fsync_directory(directory: Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Append-only journal of storage writes with group commit and snapshots.
+
+    ``append`` only buffers the record; a background thread writes and fsyncs
+    the buffer every ``fsync_interval`` seconds, so a burst of writes shares
+    one fsync and a crash loses at most one interval. With an interval of 0
+    every append is flushed before it returns.
+
+    Every ``snapshot_every`` records the owner hands over a function that
+    builds its state; the journal starts a new segment, then builds and writes
+    the snapshot in the background and drops the segments it covers. Recovery is the
+    latest snapshot plus the records after its ``seq``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_interval: float = 0.05,
+        snapshot_every: int = 10_000,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._seq = 0
+        self._since_snapshot = 0
+        self._segment = None
+        self._stopped = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._snapshotter: Optional[threading.Thread] = None
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob(SEGMENT_GLOB))
+
+    def _open_segment(self) -> Path:
+        path = self.directory / f"journal-{self._seq + 1:012d}.log"
+        self._segment = open(path, "a", encoding="utf-8")
+        return path
+
+    @staticmethod
+    def _read_segment(path: Path) -> List[dict]:
+        """Records of one segment, cutting off the torn tail of a crash.
+
+        The tail is a partial last line, or a last line that does not decode.
+        It is truncated away so that new appends start on a clean line.
+        """
+        with open(path, "rb") as f:
+            *lines, tail = f.read().split(b"\n")
+        records = []
+        good = 0
+        for index, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                if index < len(lines) - 1 or tail:
+                    raise
+                break
+            good += len(line) + 1
+        else:
+            if not tail:
+                return records
+        with open(path, "r+b") as f:
+            f.truncate(good)
+            os.fsync(f.fileno())
+        return records
+
+    def load(self) -> Tuple[Optional[dict], List[dict]]:
+        """Latest snapshot and the journal records written after it.
+
+        Opens a fresh segment for new appends and starts the flusher.
+        """
+        snapshot = None
+        snapshot_path = self.directory / SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with open(snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+
+        base_seq = snapshot["seq"] if snapshot else 0
+        records = []
+        for segment in self._segments():
+            records.extend(
+                record
+                for record in self._read_segment(segment)
+                if record["seq"] > base_seq
+            )
+
+        self._seq = records[-1]["seq"] if records else base_seq
+        self._since_snapshot = len(records)
+        self._open_segment()
+        if self.fsync_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, name="journal-flusher", daemon=True
+            )
+            self._flusher.start()
+        return snapshot, records
+
+    def append(self, op: str, **fields: Any) -> None:
+        with self._lock:
+            self._seq += 1
+            self._since_snapshot += 1
+            record = {"seq": self._seq, "op": op, **fields}
+            self._buffer.append(json.dumps(record, default=_encode) + "\n")
+        if self.fsync_interval <= 0:
+            self.flush()
+
+    def _write_buffer(self) -> None:
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if lines:
+            self._segment.write("".join(lines))
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+
+    def flush(self) -> None:
+        with self._io_lock:
+            self._write_buffer()
+
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.fsync_interval):
+            self.flush()
+
+    def snapshot_due(self) -> bool:
+        snapshotting = self._snapshotter is not None and self._snapshotter.is_alive()
+        return self._since_snapshot >= self.snapshot_every and not snapshotting
+
+    def snapshot(self, state: Callable[[], dict], background: bool = True) -> None:
+        """Persist ``state()`` as of the last appended record.
+
+        The caller must not append while this runs. ``state`` is called on the
+        background thread, so it must only read data that later writes leave
+        untouched.
+        """
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        with self._io_lock:
+            self._write_buffer()
+            self._segment.close()
+            seq = self._seq
+            self._since_snapshot = 0
+            current = self._open_segment()
+            covered = [path for path in self._segments() if path != current]
+
+        if not background:
+            self._write_snapshot(seq, state, covered)
+            return
+        self._snapshotter = threading.Thread(
+            target=self._write_snapshot,
+            args=(seq, state, covered),
+            name="journal-snapshot",
+        )
+        self._snapshotter.start()
+
+    def _write_snapshot(
+        self, seq: int, state: Callable[[], dict], covered: List[Path]
+    ) -> None:
+        payload = {"seq": seq, **state()}
+        tmp_path = self.directory / f"{SNAPSHOT_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, default=_encode, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.directory / SNAPSHOT_FILE)
+        _fsync_directory(self.directory)
+        for segment in covered:
+            segment.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        if self._segment is not None:
+            self.flush()
+            self._segment.close()
+            self._segment = None
@@ -1,30 +1,71 @@
-from typing import Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Literal, Optional, Sequence, Tuple
 
-from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 
+from app.async_storage import async_storage
 from app.auth import router as auth_router
+from app.compression import CompressionMiddleware
+from app.conditional import etag_matches, not_modified, owner_etag
 from app.errors import problem
+from app.idempotency import IdempotencyError, run_idempotent
 from app.markdown_builder import HighlightsMarkdownExporter
 from app.middleware import CorrelationIdMiddleware
 from app.models import (
     Highlight,
+    HighlightBatchCreate,
+    HighlightBatchItem,
+    HighlightBatchResponse,
     HighlightCreate,
     HighlightListResponse,
     HighlightResponse,
     HighlightUpdate,
+    SourceListResponse,
+    SourceSummary,
+    TagCountsResponse,
+    TagOperationResponse,
+    TagRename,
+)
+from app.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    CursorError,
+    decode_cursor,
+    encode_cursor,
 )
 from app.rate_limiter import get_client_ip, rate_limit
 from app.security.authorization import AuthUser, require_auth, require_owner
+from app.serialization import (
+    cache_stats,
+    highlight_list_response,
+    highlight_response,
+    ndjson_response,
+)
 from app.storage import storage
 
+BATCH_ITEMS_PER_MINUTE = 1000
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+STREAM_BATCH_SIZE = 500
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    storage.close()
+
+
 app = FastAPI(
     title="Reading Highlights API",
     version="1.0.0",
     description="API for managing reading highlights and quotes",
+    lifespan=lifespan,
 )
 
 app.add_middleware(CorrelationIdMiddleware)
+app.add_middleware(CompressionMiddleware)
 app.include_router(auth_router)
 
 
@@ -46,6 +87,11 @@ async def api_error_handler(request: Request, exc: ApiError):
     )
 
 
+@app.exception_handler(IdempotencyError)
+async def idempotency_error_handler(request: Request, exc: IdempotencyError):
+    return await api_error_handler(request, exc)
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     detail = exc.detail if isinstance(exc.detail, str) else "HTTP error occurred"
@@ -83,56 +129,356 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+def created_range(
+    created_from: Optional[datetime] = Query(
+        None, description="Only highlights created at or after this time"
+    ),
+    created_to: Optional[datetime] = Query(
+        None, description="Only highlights created before this time"
+    ),
+) -> dict:
+    """created_at range filter for storage calls.
+
+    Aware times are converted to naive local time, the way timestamps are stored.
+    """
+    bounds = {}
+    for name, value in (("created_from", created_from), ("created_to", created_to)):
+        if value is not None and value.tzinfo is not None:
+            try:
+                value = value.astimezone().replace(tzinfo=None)
+            except (OverflowError, ValueError):
+                raise ApiError(
+                    code="invalid_date_range",
+                    message=f"{name} is outside the supported date range",
+                )
+        bounds[name] = value
+    return bounds
+
+
+def field_projection(
+    fields: Optional[str] = Query(
+        None, description="Comma-separated highlight fields to return"
+    ),
+) -> Optional[Tuple[str, ...]]:
+    """Requested highlight fields in order; None means the whole highlight"""
+    if fields is None:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",")))
+    unknown = [name for name in names if name not in Highlight.model_fields]
+    if unknown:
+        raise ApiError(
+            code="invalid_fields",
+            message=f"Unknown fields: {', '.join(unknown) or '(empty)'}",
+        )
+    return None if len(names) == len(Highlight.model_fields) else names
+
+
+def _including(
+    fields: Optional[Tuple[str, ...]], *names: str
+) -> Optional[Tuple[str, ...]]:
+    """``fields`` plus the ones a route needs itself"""
+    return None if fields is None else tuple(dict.fromkeys(fields + names))
+
+
+def _projected(highlight: dict, fields: Optional[Tuple[str, ...]]) -> dict:
+    if fields is None or len(highlight) == len(fields):
+        return highlight
+    return {name: highlight[name] for name in fields}
+
+
+def _projected_all(
+    highlights: Sequence[dict], fields: Optional[Tuple[str, ...]]
+) -> Sequence[dict]:
+    """``_projected`` per item; without ``fields`` the storage sequence as is"""
+    if fields is None:
+        return highlights
+    return [_projected(highlight, fields) for highlight in highlights]
+
+
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics(user: AuthUser = Depends(require_auth)):
+    if not user.is_admin():
+        raise ApiError(code="forbidden", message="Admin role required", status=403)
+    return {"json_cache": cache_stats.snapshot()}
+
+
 @app.post("/highlights", response_model=HighlightResponse, status_code=201)
 async def create_highlight(
     request: Request,
+    response: Response,
     highlight_data: HighlightCreate,
+    on_duplicate: Literal["allow", "reject", "return"] = Query(
+        "allow", description="What to do if the same text and source already exist"
+    ),
+    idempotency_key: Optional[str] = Header(
+        None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH
+    ),
     user: AuthUser = Depends(require_auth),
 ):
-    await rate_limit(request, get_client_ip(request), max_requests=10, window_minutes=1)
+    async def handle() -> HighlightResponse:
+        await rate_limit(
+            request, get_client_ip(request), max_requests=10, window_minutes=1
+        )
+
+        fields = {
+            "text": highlight_data.text,
+            "source": highlight_data.source,
+            "tags": highlight_data.tags,
+            "owner_id": user.sub,
+        }
+        if on_duplicate == "allow":
+            new_highlight = await async_storage.create(**fields)
+        else:
+            new_highlight, created = await async_storage.create_unique(**fields)
+            if not created:
+                if on_duplicate == "reject":
+                    raise ApiError(
+                        code="duplicate_highlight",
+                        message=f"Highlight already exists with ID {new_highlight['id']}",
+                        status=409,
+                    )
+                response.status_code = 200
+                return HighlightResponse(
+                    highlight=Highlight(**new_highlight),
+                    message="Highlight already exists",
+                )
+
+        return HighlightResponse(
+            highlight=Highlight(**new_highlight),
+            message="Highlight created successfully",
+        )
 
-    new_highlight = storage.create(
-        text=highlight_data.text,
-        source=highlight_data.source,
-        tags=highlight_data.tags,
-        owner_id=user.sub,
+    payload = {
+        "path": request.url.path,
+        "body": highlight_data.model_dump(),
+        "on_duplicate": on_duplicate,
+    }
+    return await run_idempotent(
+        user.sub, idempotency_key, payload, response, handle, status_code=201
     )
 
-    return HighlightResponse(
-        highlight=Highlight(**new_highlight), message="Highlight created successfully"
+
+@app.post("/highlights/batch", response_model=HighlightBatchResponse, status_code=201)
+async def create_highlights_batch(
+    request: Request,
+    response: Response,
+    batch: HighlightBatchCreate,
+    idempotency_key: Optional[str] = Header(
+        None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH
+    ),
+    user: AuthUser = Depends(require_auth),
+):
+    async def handle() -> HighlightBatchResponse:
+        await rate_limit(
+            request,
+            get_client_ip(request),
+            max_requests=BATCH_ITEMS_PER_MINUTE,
+            window_minutes=1,
+            cost=len(batch.items),
+        )
+
+        created = await async_storage.create_many(
+            [item.model_dump() for item in batch.items], owner_id=user.sub
+        )
+
+        return HighlightBatchResponse(
+            created=[
+                HighlightBatchItem(index=index, id=highlight["id"])
+                for index, highlight in enumerate(created)
+            ],
+            total=len(created),
+            message="Highlights created successfully",
+        )
+
+    payload = {"path": request.url.path, "body": batch.model_dump()}
+    return await run_idempotent(
+        user.sub, idempotency_key, payload, response, handle, status_code=201
     )
 
 
 @app.get("/highlights", response_model=HighlightListResponse)
-def get_highlights(
+async def get_highlights(
     tag: Optional[str] = Query(None, description="Filter by tag"),
+    source: Optional[str] = Query(None, description="Filter by exact source"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor of previous page"),
+    created: dict = Depends(created_range),
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection),
+    if_none_match: Optional[str] = Header(None),
     user: AuthUser = Depends(require_auth),
 ):
-    if tag:
-        highlights = storage.get_by_tag(tag, owner_id=user.sub)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except CursorError:
+        raise ApiError(code="invalid_cursor", message="Malformed pagination cursor")
+
+    etag = owner_etag(user.sub, await async_storage.version(user.sub))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    if limit is None and cursor is None:
+        if tag:
+            highlights = await async_storage.get_by_tag(
+                tag,
+                owner_id=user.sub,
+                newest_first=True,
+                source=source,
+                fields=fields,
+                **created,
+            )
+        else:
+            highlights = await async_storage.get_all(
+                owner_id=user.sub,
+                newest_first=True,
+                source=source,
+                fields=fields,
+                **created,
+            )
+        total, has_more = len(highlights), False
     else:
-        highlights = storage.get_all(owner_id=user.sub)
-
-    highlights.sort(key=lambda x: x["created_at"], reverse=True)
+        total = await async_storage.count(user.sub, tag=tag, source=source, **created)
+        highlights, has_more = await async_storage.get_page(
+            user.sub,
+            limit or DEFAULT_PAGE_SIZE,
+            after=after,
+            tag=tag,
+            source=source,
+            fields=_including(fields, "created_at", "id"),
+            **created,
+        )
 
-    return HighlightListResponse(
-        highlights=[Highlight(**h) for h in highlights],
-        total=len(highlights),
+    next_cursor = encode_cursor(highlights[-1]) if has_more else None
+    response = highlight_list_response(
+        _projected_all(highlights, fields),
+        total=total,
+        next_cursor=next_cursor,
         message="Highlights retrieved successfully",
     )
+    response.headers["ETag"] = etag
+    return response
+
+
+@app.get("/highlights/search", response_model=HighlightListResponse)
+async def search_highlights(
+    q: str = Query(..., min_length=1, max_length=200, description="Search query"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE, description="Maximum results"),
+    partial: bool = Query(False, description="Match partial words"),
+    user: AuthUser = Depends(require_auth),
+):
+    highlights = await async_storage.search(
+        q, owner_id=user.sub, limit=limit, partial=partial
+    )
+
+    return highlight_list_response(
+        highlights, total=len(highlights), message="Search completed successfully"
+    )
+
+
+@app.get("/highlights/stream", response_class=StreamingResponse)
+async def stream_highlights(
+    tag: Optional[str] = Query(None, description="Filter by tag"),
+    source: Optional[str] = Query(None, description="Filter by exact source"),
+    created: dict = Depends(created_range),
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection),
+    user: AuthUser = Depends(require_auth),
+):
+    """Every matching highlight as NDJSON, oldest first.
+
+    Read in keyset pages of STREAM_BATCH_SIZE, so memory stays flat however
+    many highlights the user has and no lock is held between pages.
+    """
+
+    async def pages():
+        after = None
+        while True:
+            page, has_more = await async_storage.get_page(
+                user.sub,
+                STREAM_BATCH_SIZE,
+                after=after,
+                tag=tag,
+                newest_first=False,
+                source=source,
+                fields=_including(fields, "created_at", "id"),
+                **created,
+            )
+            if page:
+                after = (page[-1]["created_at"], page[-1]["id"])
+                yield _projected_all(page, fields)
+            if not has_more:
+                return
+
+    return ndjson_response(pages())
+
+
+@app.get("/highlights/tags", response_model=TagCountsResponse)
+async def get_tag_counts(user: AuthUser = Depends(require_auth)):
+    counts = await async_storage.tag_counts(user.sub)
+
+    return TagCountsResponse(
+        tags=dict(sorted(counts.items(), key=lambda item: (-item[1], item[0]))),
+        total=len(counts),
+        message="Tag counts retrieved successfully",
+    )
+
+
+@app.get("/highlights/sources", response_model=SourceListResponse)
+async def get_sources(user: AuthUser = Depends(require_auth)):
+    stats = await async_storage.source_stats(user.sub)
+    stats.sort(key=lambda item: item["latest_created_at"], reverse=True)
+
+    return SourceListResponse(
+        sources=[SourceSummary(**item) for item in stats],
+        total=len(stats),
+        message="Sources retrieved successfully",
+    )
+
+
+@app.put("/highlights/tags/{tag}", response_model=TagOperationResponse)
+async def rename_tag(
+    tag: str, rename: TagRename, user: AuthUser = Depends(require_auth)
+):
+    affected = await async_storage.rename_tag(user.sub, tag.strip(), rename.name)
+
+    return TagOperationResponse(
+        tag=rename.name, affected=affected, message="Tag renamed successfully"
+    )
+
+
+@app.delete("/highlights/tags/{tag}", response_model=TagOperationResponse)
+async def remove_tag(tag: str, user: AuthUser = Depends(require_auth)):
+    affected = await async_storage.remove_tag(user.sub, tag.strip())
+
+    return TagOperationResponse(
+        tag=tag, affected=affected, message="Tag removed successfully"
+    )
+
+
+@app.delete("/highlights/tags/{tag}/highlights", response_model=TagOperationResponse)
+async def delete_highlights_by_tag(tag: str, user: AuthUser = Depends(require_auth)):
+    affected = await async_storage.delete_by_tag(user.sub, tag.strip())
+
+    return TagOperationResponse(
+        tag=tag, affected=affected, message="Highlights deleted successfully"
+    )
 
 
 @app.get("/highlights/{highlight_id}", response_model=HighlightResponse)
-def get_highlight(highlight_id: int, user: AuthUser = Depends(require_auth)):
+async def get_highlight(
+    highlight_id: int,
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection),
+    user: AuthUser = Depends(require_auth),
+):
     if user.is_admin():
-        highlight = storage.get_by_id(highlight_id)
+        highlight = await async_storage.get_by_id(highlight_id, fields=fields)
     else:
-        highlight = storage.get_by_id(highlight_id, owner_id=user.sub)
+        highlight = await async_storage.get_by_id(
+            highlight_id, owner_id=user.sub, fields=_including(fields, "owner_id")
+        )
 
     if not highlight:
         raise ApiError(
@@ -144,20 +490,22 @@ def get_highlight(highlight_id: int, user: AuthUser = Depends(require_auth)):
     if not user.is_admin():
         require_owner(highlight["owner_id"], user)
 
-    return HighlightResponse(
-        highlight=Highlight(**highlight), message="Highlight retrieved successfully"
+    return highlight_response(
+        _projected(highlight, fields), message="Highlight retrieved successfully"
     )
 
 
 @app.put("/highlights/{highlight_id}", response_model=HighlightResponse)
-def update_highlight(
+async def update_highlight(
     highlight_id: int,
     highlight_data: HighlightUpdate,
     user: AuthUser = Depends(require_auth),
 ):
     update_data = highlight_data.model_dump(exclude_unset=True)
 
-    updated_highlight = storage.update(highlight_id, update_data, owner_id=user.sub)
+    updated_highlight = await async_storage.update(
+        highlight_id, update_data, owner_id=user.sub
+    )
 
     if not updated_highlight:
         raise ApiError(
@@ -173,8 +521,8 @@ def update_highlight(
 
 
 @app.delete("/highlights/{highlight_id}")
-def delete_highlight(highlight_id: int, user: AuthUser = Depends(require_auth)):
-    deleted_highlight = storage.delete(highlight_id, owner_id=user.sub)
+async def delete_highlight(highlight_id: int, user: AuthUser = Depends(require_auth)):
+    deleted_highlight = await async_storage.delete(highlight_id, owner_id=user.sub)
 
     if not deleted_highlight:
         raise ApiError(
@@ -195,18 +543,26 @@ def delete_highlight(highlight_id: int, user: AuthUser = Depends(require_auth)):
 
 
 @app.get("/highlights/export/markdown")
-def export_highlights_markdown(
+async def export_highlights_markdown(
+    response: Response,
     tag: Optional[str] = Query(None, description="Filter by tag"),
+    created: dict = Depends(created_range),
+    if_none_match: Optional[str] = Header(None),
     user: AuthUser = Depends(require_auth),
 ):
+    etag = owner_etag(user.sub, await async_storage.version(user.sub))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     if tag:
-        highlights = storage.get_by_tag(tag, owner_id=user.sub)
+        highlights = await async_storage.get_by_tag(tag, owner_id=user.sub, **created)
     else:
-        highlights = storage.get_all(owner_id=user.sub)
+        highlights = await async_storage.get_all(owner_id=user.sub, **created)
 
     markdown_content, total = HighlightsMarkdownExporter.export(
         highlights, filter_tag=tag
     )
+    response.headers["ETag"] = etag
 
     return {
         "message": "Markdown export generated successfully",
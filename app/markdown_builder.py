@@ -82,7 +82,7 @@ class HighlightsMarkdownExporter:
         Export highlights to Markdown format
 
         Args:
-            highlights: List of highlight dictionaries
+            highlights: List of highlight dictionaries, oldest first
             filter_tag: Optional tag for filtering (for display purposes)
 
         Returns:
@@ -96,9 +96,7 @@ class HighlightsMarkdownExporter:
             builder.add_metadata("Filtered by tag", f"#{filter_tag}")
             builder.add_line_break()
 
-        sorted_highlights = sorted(highlights, key=lambda x: x["created_at"])
-
-        for highlight in sorted_highlights:
+        for highlight in highlights:
             builder.add_highlight(
                 text=highlight["text"],
                 source=highlight["source"],
@@ -106,7 +104,7 @@ class HighlightsMarkdownExporter:
                 created_at=highlight["created_at"],
             )
 
-        if not sorted_highlights:
+        if not highlights:
             builder.add_raw_text("*No highlights found.*")
 
         return builder.build(), builder.get_highlights_count()
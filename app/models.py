@@ -1,8 +1,10 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
+MAX_BATCH_SIZE = 100
+
 
 class HighlightCreate(BaseModel):
     text: str = Field(
@@ -26,6 +28,12 @@ class HighlightCreate(BaseModel):
         return [tag.strip().lower() for tag in v if tag.strip()]
 
 
+class HighlightBatchCreate(BaseModel):
+    items: List[HighlightCreate] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE, description="Highlights to create"
+    )
+
+
 class HighlightUpdate(BaseModel):
     text: Optional[str] = Field(None, min_length=1, max_length=2000)
     source: Optional[str] = Field(None, min_length=1, max_length=500)
@@ -41,6 +49,18 @@ class HighlightUpdate(BaseModel):
         return [tag.strip().lower() for tag in v if tag.strip()]
 
 
+class TagRename(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100, description="New tag name")
+
+    @field_validator("name")
+    @classmethod
+    def validate_name(cls, v):
+        v = v.strip().lower()
+        if not v:
+            raise ValueError("Tag name must not be blank")
+        return v
+
+
 class Highlight(BaseModel):
     id: int
     text: str
@@ -65,4 +85,48 @@ class HighlightListResponse(BaseModel):
 
     highlights: List[Highlight]
     total: int
+    next_cursor: Optional[str] = None
+    message: str = "Success"
+
+
+class HighlightBatchItem(BaseModel):
+    index: int
+    id: int
+
+
+class HighlightBatchResponse(BaseModel):
+    """Response model for batch creation"""
+
+    created: List[HighlightBatchItem]
+    total: int
+    message: str = "Success"
+
+
+class TagOperationResponse(BaseModel):
+    """Response model for bulk tag operations"""
+
+    tag: str
+    affected: int
+    message: str = "Success"
+
+
+class TagCountsResponse(BaseModel):
+    """Response model for per-tag highlight counts"""
+
+    tags: Dict[str, int]
+    total: int
+    message: str = "Success"
+
+
+class SourceSummary(BaseModel):
+    source: str
+    count: int
+    latest_created_at: datetime
+
+
+class SourceListResponse(BaseModel):
+    """Response model for listing highlight sources"""
+
+    sources: List[SourceSummary]
+    total: int
     message: str = "Success"
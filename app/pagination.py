@@ -0,0 +1,31 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_ID = 2**63 - 1
+
+
+class CursorError(Exception):
+    pass
+
+
+def encode_cursor(highlight: dict) -> str:
+    raw = f"{highlight['created_at'].isoformat()}|{highlight['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, highlight_id = raw.split("|")
+        created_at, highlight_id = datetime.fromisoformat(created_at), int(highlight_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError("invalid_cursor")
+    # Cursors come from clients; stored timestamps are naive and ids fit SQLite
+    if created_at.tzinfo is not None or not 0 <= highlight_id <= MAX_ID:
+        raise CursorError("invalid_cursor")
+    return created_at, highlight_id
@@ -1,16 +1,27 @@
 from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.config import config
+from app.shared_state import SQLiteRateLimiter, shared_path
 
 
 class RateLimiter:
+    blocking = False
+
     def __init__(self):
         self._requests: Dict[Tuple[str, str], list[datetime]] = defaultdict(list)
 
     def check_limit(
-        self, identifier: str, endpoint: str, max_requests: int, window: timedelta
+        self,
+        identifier: str,
+        endpoint: str,
+        max_requests: int,
+        window: timedelta,
+        cost: int = 1,
     ) -> bool:
         key = (identifier, endpoint)
         now = datetime.now()
@@ -18,10 +29,10 @@ class RateLimiter:
 
         self._requests[key] = [ts for ts in self._requests[key] if ts > cutoff]
 
-        if len(self._requests[key]) >= max_requests:
+        if len(self._requests[key]) + cost > max_requests:
             return False
 
-        self._requests[key].append(now)
+        self._requests[key].extend([now] * cost)
         return True
 
     def cleanup_old_entries(self, max_age: timedelta = timedelta(hours=1)):
@@ -35,8 +46,17 @@ class RateLimiter:
         for key in keys_to_delete:
             del self._requests[key]
 
+    def reset(self) -> None:
+        self._requests.clear()
+
+
+def create_rate_limiter(database_url: Optional[str] = None):
+    """Per-process limiter, or one shared by all workers for a SQLite file"""
+    path = shared_path(database_url)
+    return SQLiteRateLimiter(path) if path else RateLimiter()
+
 
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter(config.database_url)
 
 
 def get_client_ip(request: Request) -> str:
@@ -47,10 +67,17 @@ def get_client_ip(request: Request) -> str:
 
 
 async def rate_limit(
-    request: Request, identifier: str, max_requests: int, window_minutes: int
+    request: Request,
+    identifier: str,
+    max_requests: int,
+    window_minutes: int,
+    cost: int = 1,
 ):
     endpoint = request.url.path
-    if not rate_limiter.check_limit(
-        identifier, endpoint, max_requests, timedelta(minutes=window_minutes)
-    ):
+    args = (identifier, endpoint, max_requests, timedelta(minutes=window_minutes), cost)
+    if rate_limiter.blocking:
+        allowed = await run_in_threadpool(rate_limiter.check_limit, *args)
+    else:
+        allowed = rate_limiter.check_limit(*args)
+    if not allowed:
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
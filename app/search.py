@@ -0,0 +1,133 @@
+import hashlib
+import heapq
+import math
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+TRIGRAM_SIZE = 3
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def content_hash(text: str, source: str) -> bytes:
+    """Digest of text and source with case and whitespace runs normalized"""
+    normalized = "\x1f".join(
+        " ".join(value.split()).casefold() for value in (text, source)
+    )
+    return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+
+def trigrams(token: str) -> Set[str]:
+    return {token[i : i + TRIGRAM_SIZE] for i in range(len(token) - TRIGRAM_SIZE + 1)}
+
+
+class _OwnerIndex:
+    __slots__ = ("postings", "doc_len", "total_len", "vocabulary")
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.total_len = 0
+        self.vocabulary: Dict[str, Set[str]] = {}
+
+
+class SearchIndex:
+    """Per-owner inverted index over highlight text with BM25 ranking"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, use_trigrams: bool = True):
+        self.k1 = k1
+        self.b = b
+        self.use_trigrams = use_trigrams
+        self._owners: Dict[str, _OwnerIndex] = {}
+
+    def add(self, owner_id: str, doc_id: int, text: str) -> None:
+        index = self._owners.setdefault(owner_id, _OwnerIndex())
+        tokens = tokenize(text)
+        index.doc_len[doc_id] = len(tokens)
+        index.total_len += len(tokens)
+
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            postings = index.postings.get(token)
+            if postings is None:
+                postings = index.postings[token] = {}
+                if self.use_trigrams:
+                    for gram in trigrams(token):
+                        index.vocabulary.setdefault(gram, set()).add(token)
+            postings[doc_id] = tf
+
+    def remove(self, owner_id: str, doc_id: int, text: str) -> None:
+        index = self._owners.get(owner_id)
+        if index is None or doc_id not in index.doc_len:
+            return
+        index.total_len -= index.doc_len.pop(doc_id)
+
+        for token in set(tokenize(text)):
+            postings = index.postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if postings:
+                continue
+            del index.postings[token]
+            for gram in trigrams(token) if self.use_trigrams else ():
+                tokens = index.vocabulary.get(gram)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del index.vocabulary[gram]
+
+        if not index.doc_len:
+            del self._owners[owner_id]
+
+    def _expand(self, index: _OwnerIndex, token: str) -> Iterable[str]:
+        """Vocabulary tokens containing ``token`` as a substring"""
+        grams = trigrams(token)
+        if not grams:
+            return [token] if token in index.postings else []
+        candidates = None
+        for gram in sorted(grams, key=lambda g: len(index.vocabulary.get(g, ()))):
+            tokens = index.vocabulary.get(gram)
+            if not tokens:
+                return []
+            candidates = set(tokens) if candidates is None else candidates & tokens
+            if not candidates:
+                return []
+        return [t for t in candidates if token in t]
+
+    def search(
+        self, owner_id: str, query: str, limit: int = 20, partial: bool = False
+    ) -> List[Tuple[int, float]]:
+        """Top ``limit`` (doc_id, score) pairs for ``query``, best first"""
+        index = self._owners.get(owner_id)
+        if index is None:
+            return []
+
+        terms: Set[str] = set()
+        for token in set(tokenize(query)):
+            if partial and self.use_trigrams:
+                terms.update(self._expand(index, token))
+            elif token in index.postings:
+                terms.add(token)
+        if not terms:
+            return []
+
+        doc_count = len(index.doc_len)
+        avg_len = index.total_len / doc_count
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = index.postings[term]
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * index.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (
+                    tf + norm
+                )
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -5,6 +5,7 @@ from uuid import uuid4
 import jwt
 
 from app.config import config
+from app.shared_state import SQLiteDenylist, shared_path
 
 ACCESS_TOKEN_TTL = timedelta(minutes=15)
 REFRESH_TOKEN_TTL = timedelta(days=7)
@@ -13,7 +14,14 @@ ALGORITHM = "HS256"
 ISSUER = "reading-highlights-api"
 AUDIENCE = "reading-highlights-api"
 
-_refresh_denylist: set[str] = set()
+
+def create_denylist(database_url: Optional[str] = None):
+    """In-process set, or a table shared by all workers for a SQLite file"""
+    path = shared_path(database_url)
+    return SQLiteDenylist(path, ttl=REFRESH_TOKEN_TTL) if path else set()
+
+
+_refresh_denylist = create_denylist(config.database_url)
 
 
 class TokenError(Exception):
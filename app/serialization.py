@@ -0,0 +1,128 @@
+import json
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
+
+from starlette.responses import Response, StreamingResponse
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """Compact JSON bytes; orjson when installed, the stdlib otherwise"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(
+        payload, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+class CacheStats:
+    """Hit/miss counters of the per-record JSON cache.
+
+    ``encode_seconds`` is the CPU time spent encoding on misses; every hit is
+    assumed to save the average miss cost.
+    """
+
+    __slots__ = ("hits", "misses", "encode_seconds")
+
+    def __init__(self):
+        self.reset()
+
+    def hit(self) -> None:
+        self.hits += 1
+
+    def miss(self, seconds: float) -> None:
+        self.misses += 1
+        self.encode_seconds += seconds
+
+    def reset(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        average = self.encode_seconds / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "encode_seconds": self.encode_seconds,
+            "cpu_seconds_saved": self.hits * average,
+        }
+
+
+cache_stats = CacheStats()
+
+
+def cached_dumps(holder: Any, payload: Callable[[], dict]) -> bytes:
+    """``holder.json`` when set, otherwise encode ``payload()`` and keep it there"""
+    encoded = holder.json
+    if encoded is not None:
+        cache_stats.hit()
+        return encoded
+    start = time.thread_time()
+    encoded = holder.json = dumps(payload())
+    cache_stats.miss(time.thread_time() - start)
+    return encoded
+
+
+def _encode_item(highlight: dict) -> bytes:
+    encode = getattr(highlight, "json", None)
+    return encode() if encode is not None else dumps(highlight)
+
+
+def _encode_items(highlights: Sequence[dict]) -> List[bytes]:
+    """Item encodings; storage sequences with ``json_items`` skip the dicts"""
+    encode_all = getattr(highlights, "json_items", None)
+    if encode_all is not None:
+        return encode_all()
+    return [_encode_item(highlight) for highlight in highlights]
+
+
+async def _ndjson(pages: AsyncIterator[Sequence[dict]]) -> AsyncIterator[bytes]:
+    async for page in pages:
+        yield b"".join([item + b"\n" for item in _encode_items(page)])
+
+
+def ndjson_response(pages: AsyncIterator[Sequence[dict]]) -> StreamingResponse:
+    """application/x-ndjson body written one page of highlights at a time"""
+    return StreamingResponse(_ndjson(pages), media_type="application/x-ndjson")
+
+
+def highlight_response(highlight: dict, message: str) -> Response:
+    """HighlightResponse body around the highlight's (cached) JSON"""
+    body = b'{"highlight":%s,"message":%s}' % (_encode_item(highlight), dumps(message))
+    return Response(body, media_type="application/json")
+
+
+def highlight_list_response(
+    highlights: Sequence[dict],
+    total: int,
+    message: str,
+    next_cursor: Optional[str] = None,
+) -> Response:
+    """HighlightListResponse body serialized straight from storage dicts.
+
+    Storage already returns exactly the Highlight fields, so the per-item
+    pydantic models and the response_model pass are skipped; the route's
+    ``response_model`` still documents the shape. Highlights read from the
+    in-memory engine are joined from their records' cached JSON without
+    building the dicts.
+    """
+    items = b",".join(_encode_items(highlights))
+    rest = dumps({"total": total, "next_cursor": next_cursor, "message": message})
+    body = b'{"highlights":[%s],%s' % (items, rest[1:])
+    return Response(body, media_type="application/json")
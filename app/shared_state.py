@@ -0,0 +1,282 @@
+"""SQLite-backed rate limiter, refresh token denylist and idempotency keys.
+
+With ``DATABASE_URL`` pointing at a SQLite file every worker process opens
+the same database, so ``uvicorn --workers N`` shares highlights, rate-limit
+counters, revoked tokens and idempotent results instead of keeping one copy
+per process.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, NamedTuple, Optional
+
+from app.errors import IdempotencyError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit_hits (
+    identifier TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    at REAL NOT NULL,
+    cost INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rate_limit_hits_key
+    ON rate_limit_hits (identifier, endpoint, at);
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    revoked_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    owner_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    status_code INTEGER,
+    body TEXT,
+    PRIMARY KEY (owner_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_idempotency_keys_used
+    ON idempotency_keys (used_at);
+"""
+
+
+def sqlite_path(database_url: str) -> str:
+    """Database path of a ``sqlite:///<path>`` URL.
+
+    ``sqlite:////abs/file.db`` is absolute and ``sqlite:///file.db`` relative;
+    an in-memory database has to be asked for as ``sqlite:///:memory:``. Other
+    spellings raise ValueError rather than quietly losing data on restart.
+    """
+    prefix = "sqlite:///"
+    path = database_url[len(prefix) :] if database_url.startswith(prefix) else ""
+    if not path:
+        raise ValueError(
+            f"Malformed SQLite DATABASE_URL {database_url!r}, "
+            "expected sqlite:///<path> or sqlite:///:memory:"
+        )
+    return path
+
+
+def shared_path(database_url: Optional[str]) -> Optional[str]:
+    """SQLite file behind ``database_url``; None when there is nothing to share"""
+    if not database_url or not database_url.startswith("sqlite:"):
+        return None
+    path = sqlite_path(database_url)
+    return None if path == ":memory:" else path
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Connection shared by the threads of one process, WAL across processes"""
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _SQLiteState:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteRateLimiter(_SQLiteState):
+    """Sliding-window rate limiter with the RateLimiter interface.
+
+    Each check runs in one ``BEGIN IMMEDIATE`` transaction, so concurrent
+    workers cannot both take the last slot of a window.
+    """
+
+    blocking = True
+
+    def check_limit(
+        self,
+        identifier: str,
+        endpoint: str,
+        max_requests: int,
+        window: timedelta,
+        cost: int = 1,
+    ) -> bool:
+        now = time.time()
+        cutoff = now - window.total_seconds()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "DELETE FROM rate_limit_hits "
+                "WHERE identifier = ? AND endpoint = ? AND at <= ?",
+                (identifier, endpoint, cutoff),
+            )
+            used = self._conn.execute(
+                "SELECT COALESCE(SUM(cost), 0) FROM rate_limit_hits "
+                "WHERE identifier = ? AND endpoint = ?",
+                (identifier, endpoint),
+            ).fetchone()[0]
+            if used + cost > max_requests:
+                return False
+            self._conn.execute(
+                "INSERT INTO rate_limit_hits (identifier, endpoint, at, cost) "
+                "VALUES (?, ?, ?, ?)",
+                (identifier, endpoint, now, cost),
+            )
+            return True
+
+    def cleanup_old_entries(self, max_age: timedelta = timedelta(hours=1)):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM rate_limit_hits WHERE at <= ?",
+                (time.time() - max_age.total_seconds(),),
+            )
+
+    def reset(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rate_limit_hits")
+
+
+class SQLiteDenylist(_SQLiteState):
+    """Set of revoked refresh token ids (``add``, ``in``, ``clear``).
+
+    Entries older than ``ttl`` belong to tokens that have expired anyway and
+    are pruned on insert.
+    """
+
+    def __init__(self, path: str, ttl: timedelta):
+        super().__init__(path)
+        self.ttl = ttl
+
+    def add(self, jti: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO revoked_tokens (jti, revoked_at) VALUES (?, ?)",
+                (jti, now),
+            )
+            self._conn.execute(
+                "DELETE FROM revoked_tokens WHERE revoked_at < ?",
+                (now - self.ttl.total_seconds(),),
+            )
+
+    def __contains__(self, jti: object) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM revoked_tokens WHERE jti = ?", (jti,)
+            ).fetchone()
+        return row is not None
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM revoked_tokens")
+
+
+class IdempotentReplay(NamedTuple):
+    status_code: int
+    body: Any
+
+
+class SQLiteIdempotencyCache(_SQLiteState):
+    """Idempotency keys shared by all workers, with the IdempotencyCache interface.
+
+    A key is reserved in the same ``BEGIN IMMEDIATE`` transaction that looks
+    it up, so a retry reaching another worker is refused or replayed, never
+    run twice. Completed results live ``ttl`` seconds; a reservation only
+    ``lease`` seconds, so a worker dying mid-request does not block the key
+    for a day. Past ``max_entries`` the least recently used keys go first.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        ttl: float,
+        lease: float = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lease = lease
+        self._clock = clock
+
+    def begin(
+        self, owner_id: str, key: str, request_hash: str
+    ) -> Optional[IdempotentReplay]:
+        """Completed result to replay, or None after reserving the key"""
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT fingerprint, status_code, body FROM idempotency_keys "
+                "WHERE owner_id = ? AND key = ? AND expires_at > ?",
+                (owner_id, key, now),
+            ).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,)
+                )
+                self._conn.execute(
+                    "INSERT INTO idempotency_keys "
+                    "(owner_id, key, fingerprint, expires_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (owner_id, key, request_hash, now + self.lease, now),
+                )
+                self._evict()
+                return None
+            stored_hash, status_code, body = row
+            if stored_hash != request_hash:
+                raise IdempotencyError.key_reused()
+            if status_code is None:
+                raise IdempotencyError.in_progress()
+            self._conn.execute(
+                "UPDATE idempotency_keys SET used_at = ? "
+                "WHERE owner_id = ? AND key = ?",
+                (now, owner_id, key),
+            )
+            return IdempotentReplay(status_code, json.loads(body))
+
+    def _evict(self) -> None:
+        self._conn.execute(
+            "DELETE FROM idempotency_keys WHERE (owner_id, key) IN ("
+            "SELECT owner_id, key FROM idempotency_keys ORDER BY used_at "
+            "LIMIT max(0, (SELECT COUNT(*) FROM idempotency_keys) - ?))",
+            (self.max_entries,),
+        )
+
+    def complete(self, owner_id: str, key: str, status_code: int, body: Any) -> None:
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE idempotency_keys "
+                "SET status_code = ?, body = ?, expires_at = ?, used_at = ? "
+                "WHERE owner_id = ? AND key = ?",
+                (status_code, json.dumps(body), now + self.ttl, now, owner_id, key),
+            )
+
+    def abandon(self, owner_id: str, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM idempotency_keys "
+                "WHERE owner_id = ? AND key = ? AND status_code IS NULL",
+                (owner_id, key),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM idempotency_keys")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM idempotency_keys"
+            ).fetchone()[0]
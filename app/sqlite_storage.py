@@ -0,0 +1,644 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.search import TRIGRAM_SIZE, content_hash, tokenize
+from app.storage import DEFAULT_HIGHLIGHTS, SortKey, from_micros, to_micros
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS highlights (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL,
+    source TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    owner_id TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    content_hash BLOB
+);
+CREATE INDEX IF NOT EXISTS ix_highlights_owner_created
+    ON highlights (owner_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_highlights_owner_source
+    ON highlights (owner_id, source, created_at, id);
+
+CREATE TABLE IF NOT EXISTS highlight_tags (
+    owner_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    highlight_id INTEGER NOT NULL,
+    PRIMARY KEY (owner_id, tag, created_at, highlight_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_highlight_tags_highlight
+    ON highlight_tags (highlight_id);
+
+CREATE TABLE IF NOT EXISTS owner_versions (
+    owner_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS version_epoch (epoch INTEGER NOT NULL);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS highlights_fts
+    USING fts5(owner_id UNINDEXED, text, source);
+CREATE VIRTUAL TABLE IF NOT EXISTS highlights_fts_trigram
+    USING fts5(owner_id UNINDEXED, text, source, tokenize='trigram');
+"""
+
+CONTENT_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_highlights_owner_content
+    ON highlights (owner_id, content_hash)
+"""
+
+_COLUMNS = "h.id, h.text, h.source, h.tags, h.owner_id, h.created_at, h.updated_at"
+
+
+def _row_to_dict(row: tuple) -> dict:
+    return {
+        "id": row[0],
+        "text": row[1],
+        "source": row[2],
+        "tags": json.loads(row[3]),
+        "owner_id": row[4],
+        "created_at": from_micros(row[5]),
+        "updated_at": from_micros(row[6]),
+    }
+
+
+_FIELD_COLUMNS: Dict[str, Tuple[str, Optional[Callable[[Any], Any]]]] = {
+    "id": ("h.id", None),
+    "text": ("h.text", None),
+    "source": ("h.source", None),
+    "tags": ("h.tags", json.loads),
+    "owner_id": ("h.owner_id", None),
+    "created_at": ("h.created_at", from_micros),
+    "updated_at": ("h.updated_at", from_micros),
+}
+
+
+def _projection(
+    fields: Optional[Sequence[str]],
+) -> Tuple[str, Callable[[tuple], dict]]:
+    """SELECT list and row converter for ``fields`` (every field when None)"""
+    if fields is None:
+        return _COLUMNS, _row_to_dict
+    columns = ", ".join(_FIELD_COLUMNS[name][0] for name in fields)
+    converters = [(name, _FIELD_COLUMNS[name][1]) for name in fields]
+
+    def convert(row: tuple) -> dict:
+        return {
+            name: value if converter is None else converter(value)
+            for (name, converter), value in zip(converters, row)
+        }
+
+    return columns, convert
+
+
+def _match_expression(query: str, partial: bool) -> str:
+    tokens = set(tokenize(query))
+    if partial:
+        tokens = {t for t in tokens if len(t) >= TRIGRAM_SIZE}
+    return " OR ".join(f'"{token}"' for token in sorted(tokens))
+
+
+class SQLiteHighlightStorage:
+    """SQLite storage for highlights with the HighlightStorage interface"""
+
+    blocking = True
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, cached_statements=256, timeout=10
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._upgrade()
+        self._seed()
+
+    def _upgrade(self) -> None:
+        """Add and backfill ``content_hash`` in databases created without it"""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            columns = {
+                row[1] for row in self._conn.execute("PRAGMA table_info(highlights)")
+            }
+            if "content_hash" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE highlights ADD COLUMN content_hash BLOB"
+                )
+                rows = self._conn.execute("SELECT id, text, source FROM highlights")
+                self._conn.executemany(
+                    "UPDATE highlights SET content_hash = ? WHERE id = ?",
+                    [(content_hash(text, source), id_) for id_, text, source in rows],
+                )
+            self._conn.execute(CONTENT_INDEX)
+
+    def _seed(self) -> None:
+        """Insert the defaults into an empty database.
+
+        Checked inside a write transaction so that several workers opening a
+        new file at once seed it exactly once.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT INTO version_epoch (epoch) SELECT ? "
+                "WHERE NOT EXISTS (SELECT 1 FROM version_epoch)",
+                (time.time_ns(),),
+            )
+            if self._conn.execute("SELECT 1 FROM highlights LIMIT 1").fetchone():
+                return
+            for highlight in DEFAULT_HIGHLIGHTS:
+                self._insert(highlight)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _insert(self, highlight: dict) -> None:
+        created_at = to_micros(highlight["created_at"])
+        self._conn.execute(
+            "INSERT INTO highlights "
+            "(id, text, source, tags, owner_id, created_at, updated_at, content_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                highlight["id"],
+                highlight["text"],
+                highlight["source"],
+                json.dumps(highlight["tags"]),
+                highlight["owner_id"],
+                created_at,
+                to_micros(highlight["updated_at"]),
+                content_hash(highlight["text"], highlight["source"]),
+            ),
+        )
+        self._index(highlight, created_at)
+
+    def _index(self, highlight: dict, created_at: int) -> None:
+        owner_id, highlight_id = highlight["owner_id"], highlight["id"]
+        self._conn.executemany(
+            "INSERT INTO highlight_tags (owner_id, tag, created_at, highlight_id) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (owner_id, tag, created_at, highlight_id)
+                for tag in set(highlight["tags"])
+            ],
+        )
+        for table in ("highlights_fts", "highlights_fts_trigram"):
+            self._conn.execute(
+                f"INSERT INTO {table} (rowid, owner_id, text, source) "
+                "VALUES (?, ?, ?, ?)",
+                (highlight_id, owner_id, highlight["text"], highlight["source"]),
+            )
+
+    def _unindex(self, highlight_id: int) -> None:
+        self._conn.execute(
+            "DELETE FROM highlight_tags WHERE highlight_id = ?", (highlight_id,)
+        )
+        for table in ("highlights_fts", "highlights_fts_trigram"):
+            self._conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (highlight_id,))
+
+    def _bump(self, owner_id: str) -> None:
+        self._conn.execute(
+            "INSERT INTO owner_versions (owner_id, version) "
+            "VALUES (?, (SELECT epoch FROM version_epoch) + 1) "
+            "ON CONFLICT (owner_id) DO UPDATE SET version = version + 1",
+            (owner_id,),
+        )
+
+    def version(self, owner_id: str) -> int:
+        """Counter bumped in the transaction of every write to the owner's rows.
+
+        Counters start from an epoch taken from the clock when the database is
+        created or reset, so a recreated database (or a new ``:memory:`` one)
+        never hands out a version seen before.
+        """
+        rows = self._query(
+            "SELECT COALESCE("
+            "(SELECT version FROM owner_versions WHERE owner_id = ?), "
+            "(SELECT epoch FROM version_epoch))",
+            (owner_id,),
+        )
+        return rows[0][0]
+
+    def reset_to_default(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM owner_versions")
+            self._conn.execute("UPDATE version_epoch SET epoch = ?", (time.time_ns(),))
+            for table in (
+                "highlights",
+                "highlight_tags",
+                "highlights_fts",
+                "highlights_fts_trigram",
+            ):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute("DELETE FROM sqlite_sequence WHERE name = 'highlights'")
+            for highlight in DEFAULT_HIGHLIGHTS:
+                self._insert(highlight)
+
+    def _filtered(
+        self,
+        owner_id: str,
+        tag: Optional[str],
+        source: Optional[str],
+        created_from: Optional[datetime],
+        created_to: Optional[datetime],
+        rows: bool = True,
+    ) -> Tuple[str, list, str]:
+        """FROM/WHERE clause for the filters, its parameters and the sort key.
+
+        Every filter is a range of one of the (owner, ..., created_at, id)
+        indexes. A tag count without ``rows`` never touches highlights.
+        """
+        if tag is None:
+            sql = "FROM highlights h WHERE h.owner_id = ?"
+            key = "h.created_at, h.id"
+            params: list = [owner_id]
+        else:
+            join = rows or source is not None
+            sql = (
+                "FROM highlight_tags t "
+                + ("JOIN highlights h ON h.id = t.highlight_id " if join else "")
+                + "WHERE t.owner_id = ? AND t.tag = ?"
+            )
+            key = "t.created_at, t.highlight_id"
+            params = [owner_id, tag.lower()]
+        if source is not None:
+            sql += " AND h.source = ?"
+            params.append(source)
+        created_at = key.split(", ")[0]
+        if created_from is not None:
+            sql += f" AND {created_at} >= ?"
+            params.append(to_micros(created_from))
+        if created_to is not None:
+            sql += f" AND {created_at} < ?"
+            params.append(to_micros(created_to))
+        return sql, params, key
+
+    def _ordered(
+        self,
+        owner_id: str,
+        tag: Optional[str],
+        newest_first: bool,
+        after: Optional[SortKey] = None,
+        limit: int = -1,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        where, params, key = self._filtered(
+            owner_id, tag, source, created_from, created_to
+        )
+        columns, convert = _projection(fields)
+        sql = f"SELECT {columns} {where}"
+
+        direction = "DESC" if newest_first else "ASC"
+        if after is not None:
+            sql += f" AND ({key}) {'<' if newest_first else '>'} (?, ?)"
+            params += [to_micros(after[0]), after[1]]
+        order = ", ".join(f"{column} {direction}" for column in key.split(", "))
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        return [convert(row) for row in self._query(sql, tuple(params))]
+
+    def count(
+        self,
+        owner_id: str,
+        tag: Optional[str] = None,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> int:
+        where, params, _ = self._filtered(
+            owner_id, tag, source, created_from, created_to, rows=False
+        )
+        return self._query(f"SELECT COUNT(*) {where}", tuple(params))[0][0]
+
+    def source_stats(self, owner_id: str) -> List[dict]:
+        rows = self._query(
+            "SELECT source, COUNT(*), MAX(created_at) FROM highlights "
+            "WHERE owner_id = ? GROUP BY source",
+            (owner_id,),
+        )
+        return [
+            {"source": source, "count": count, "latest_created_at": from_micros(latest)}
+            for source, count, latest in rows
+        ]
+
+    def tag_counts(self, owner_id: str) -> Dict[str, int]:
+        rows = self._query(
+            "SELECT tag, COUNT(*) FROM highlight_tags WHERE owner_id = ? GROUP BY tag",
+            (owner_id,),
+        )
+        return dict(rows)
+
+    def get_page(
+        self,
+        owner_id: str,
+        limit: int,
+        after: Optional[SortKey] = None,
+        tag: Optional[str] = None,
+        newest_first: bool = True,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[dict], bool]:
+        rows = self._ordered(
+            owner_id,
+            tag,
+            newest_first,
+            after=after,
+            limit=limit + 1,
+            source=source,
+            created_from=created_from,
+            created_to=created_to,
+            fields=fields,
+        )
+        return rows[:limit], len(rows) > limit
+
+    def get_all(
+        self,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        if owner_id is None:
+            columns, convert = _projection(fields)
+            rows = self._query(f"SELECT {columns} FROM highlights h ORDER BY h.id")
+            return [convert(row) for row in rows]
+        return self._ordered(
+            owner_id,
+            None,
+            newest_first,
+            source=source,
+            created_from=created_from,
+            created_to=created_to,
+            fields=fields,
+        )
+
+    def get_by_id(
+        self,
+        highlight_id: int,
+        owner_id: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[dict]:
+        columns, convert = _projection(fields)
+        sql = f"SELECT {columns} FROM highlights h WHERE h.id = ?"
+        params: tuple = (highlight_id,)
+        if owner_id is not None:
+            sql += " AND h.owner_id = ?"
+            params += (owner_id,)
+        rows = self._query(sql, params)
+        return convert(rows[0]) if rows else None
+
+    def get_by_tag(
+        self,
+        tag: str,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        if owner_id is not None:
+            return self._ordered(
+                owner_id,
+                tag,
+                newest_first,
+                source=source,
+                created_from=created_from,
+                created_to=created_to,
+                fields=fields,
+            )
+        columns, convert = _projection(fields)
+        sql = (
+            f"SELECT {columns} FROM highlight_tags t "
+            "JOIN highlights h ON h.id = t.highlight_id WHERE t.tag = ?"
+        )
+        params: tuple = (tag.lower(),)
+        if source is not None:
+            sql += " AND h.source = ?"
+            params += (source,)
+        rows = self._query(sql, params)
+        return [convert(row) for row in rows]
+
+    def search(
+        self, query: str, owner_id: str, limit: int = 20, partial: bool = False
+    ) -> List[dict]:
+        expression = _match_expression(query, partial)
+        if not expression:
+            return []
+        table = "highlights_fts_trigram" if partial else "highlights_fts"
+        rows = self._query(
+            f"SELECT {_COLUMNS} FROM {table} f "
+            "JOIN highlights h ON h.id = f.rowid "
+            f"WHERE {table} MATCH ? AND f.owner_id = ? ORDER BY f.rank LIMIT ?",
+            (expression, owner_id, limit),
+        )
+        return [_row_to_dict(row) for row in rows]
+
+    def create(self, text: str, source: str, tags: List[str], owner_id: str) -> dict:
+        now = datetime.now()
+        micros = to_micros(now)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO highlights "
+                "(text, source, tags, owner_id, created_at, updated_at, content_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    text,
+                    source,
+                    json.dumps(tags),
+                    owner_id,
+                    micros,
+                    micros,
+                    content_hash(text, source),
+                ),
+            )
+            new_highlight = {
+                "id": cursor.lastrowid,
+                "text": text,
+                "source": source,
+                "tags": tags,
+                "owner_id": owner_id,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self._index(new_highlight, micros)
+            self._bump(owner_id)
+        return new_highlight
+
+    def create_unique(
+        self, text: str, source: str, tags: List[str], owner_id: str
+    ) -> Tuple[dict, bool]:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM highlights h "
+                "WHERE h.owner_id = ? AND h.content_hash = ? ORDER BY h.id LIMIT 1",
+                (owner_id, content_hash(text, source)),
+            ).fetchall()
+            if rows:
+                return _row_to_dict(rows[0]), False
+            return self.create(text, source, tags, owner_id), True
+
+    def create_many(self, items: List[dict], owner_id: str) -> List[dict]:
+        """Create every item (text, source, tags) in one transaction"""
+        now = datetime.now()
+        micros = to_micros(now)
+        created = []
+        with self._lock, self._conn:
+            for item in items:
+                cursor = self._conn.execute(
+                    "INSERT INTO highlights "
+                    "(text, source, tags, owner_id, created_at, updated_at, content_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        item["text"],
+                        item["source"],
+                        json.dumps(item["tags"]),
+                        owner_id,
+                        micros,
+                        micros,
+                        content_hash(item["text"], item["source"]),
+                    ),
+                )
+                highlight = {
+                    "id": cursor.lastrowid,
+                    "text": item["text"],
+                    "source": item["source"],
+                    "tags": item["tags"],
+                    "owner_id": owner_id,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                self._index(highlight, micros)
+                created.append(highlight)
+            if created:
+                self._bump(owner_id)
+        return created
+
+    def update(
+        self, highlight_id: int, update_data: dict, owner_id: Optional[str] = None
+    ) -> Optional[dict]:
+        with self._lock, self._conn:
+            highlight = self.get_by_id(highlight_id, owner_id=owner_id)
+            if highlight is None:
+                return None
+            if not update_data:
+                return highlight
+
+            highlight.update(update_data)
+            highlight["updated_at"] = datetime.now()
+            self._conn.execute(
+                "UPDATE highlights SET text = ?, source = ?, tags = ?, updated_at = ?, "
+                "content_hash = ? WHERE id = ?",
+                (
+                    highlight["text"],
+                    highlight["source"],
+                    json.dumps(highlight["tags"]),
+                    to_micros(highlight["updated_at"]),
+                    content_hash(highlight["text"], highlight["source"]),
+                    highlight_id,
+                ),
+            )
+            self._unindex(highlight_id)
+            self._index(highlight, to_micros(highlight["created_at"]))
+            self._bump(highlight["owner_id"])
+        return highlight
+
+    def delete(
+        self, highlight_id: int, owner_id: Optional[str] = None
+    ) -> Optional[dict]:
+        with self._lock, self._conn:
+            highlight = self.get_by_id(highlight_id, owner_id=owner_id)
+            if highlight is None:
+                return None
+            self._conn.execute("DELETE FROM highlights WHERE id = ?", (highlight_id,))
+            self._unindex(highlight_id)
+            self._bump(highlight["owner_id"])
+        return highlight
+
+    def _retag(self, owner_id: str, tag: str, replacement: Optional[str]) -> int:
+        tag = tag.lower()
+        if tag == replacement:
+            return 0
+        now = to_micros(datetime.now())
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT h.id, h.tags, h.created_at FROM highlight_tags t "
+                "JOIN highlights h ON h.id = t.highlight_id "
+                "WHERE t.owner_id = ? AND t.tag = ?",
+                (owner_id, tag),
+            ).fetchall()
+            for highlight_id, tags_json, _ in rows:
+                current = json.loads(tags_json)
+                tags = []
+                added = replacement is None or replacement in current
+                for name in current:
+                    if name != tag:
+                        tags.append(name)
+                    elif not added:
+                        tags.append(replacement)
+                        added = True
+                self._conn.execute(
+                    "UPDATE highlights SET tags = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(tags), now, highlight_id),
+                )
+            self._conn.execute(
+                "DELETE FROM highlight_tags WHERE owner_id = ? AND tag = ?",
+                (owner_id, tag),
+            )
+            if replacement is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO highlight_tags "
+                    "(owner_id, tag, created_at, highlight_id) VALUES (?, ?, ?, ?)",
+                    [(owner_id, replacement, row[2], row[0]) for row in rows],
+                )
+            if rows:
+                self._bump(owner_id)
+        return len(rows)
+
+    def rename_tag(self, owner_id: str, tag: str, new_tag: str) -> int:
+        return self._retag(owner_id, tag, new_tag)
+
+    def remove_tag(self, owner_id: str, tag: str) -> int:
+        return self._retag(owner_id, tag, None)
+
+    def delete_by_tag(self, owner_id: str, tag: str) -> int:
+        with self._lock, self._conn:
+            ids = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT highlight_id FROM highlight_tags "
+                    "WHERE owner_id = ? AND tag = ?",
+                    (owner_id, tag.lower()),
+                )
+            ]
+            for highlight_id in ids:
+                self._conn.execute(
+                    "DELETE FROM highlights WHERE id = ?", (highlight_id,)
+                )
+                self._unindex(highlight_id)
+            if ids:
+                self._bump(owner_id)
+        return len(ids)
+
+    def exists(self, highlight_id: int) -> bool:
+        return bool(
+            self._query("SELECT 1 FROM highlights WHERE id = ?", (highlight_id,))
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,106 +1,877 @@
+import sys
+import time
+from bisect import bisect_left, bisect_right, insort
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from app.config import config
+from app.journal import Journal
+from app.locks import RWLock
+from app.search import SearchIndex, content_hash
+from app.serialization import cached_dumps
+from app.shared_state import sqlite_path
+
+SortKey = Tuple[datetime, int]
+
+
+class OrderedIds:
+    """Highlight ids kept sorted by (created_at, id)"""
+
+    __slots__ = ("_keys",)
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int]] = []
+
+    def add(self, created_at: int, highlight_id: int) -> None:
+        insort(self._keys, (created_at, highlight_id))
+
+    def discard(self, created_at: int, highlight_id: int) -> None:
+        key = (created_at, highlight_id)
+        pos = bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            del self._keys[pos]
+
+    def _bounds(self, since: Optional[int], until: Optional[int]) -> Tuple[int, int]:
+        keys = self._keys
+        start = 0 if since is None else bisect_left(keys, (since,))
+        stop = len(keys) if until is None else bisect_left(keys, (until,))
+        return start, stop
+
+    def ids(
+        self,
+        newest_first: bool = False,
+        after: Optional[Tuple[int, int]] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> Iterator[int]:
+        """Walk ids in order, starting strictly past the ``after`` key.
+
+        ``since``/``until`` bound created_at to [since, until); both ends are
+        found by bisection, so a range of k ids costs O(log n + k).
+        """
+        keys = self._keys
+        start, stop = self._bounds(since, until)
+        if newest_first:
+            if after is not None:
+                stop = min(stop, bisect_left(keys, after))
+            positions = range(stop - 1, start - 1, -1)
+        else:
+            if after is not None:
+                start = max(start, bisect_right(keys, after))
+            positions = range(start, stop)
+        return (keys[pos][1] for pos in positions)
+
+    def count(self, since: Optional[int] = None, until: Optional[int] = None) -> int:
+        start, stop = self._bounds(since, until)
+        return max(stop - start, 0)
+
+    def latest(self) -> Optional[int]:
+        """created_at of the newest entry"""
+        return self._keys[-1][0] if self._keys else None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+DEFAULT_HIGHLIGHTS = (
+    {
+        "id": 1,
+        "text": (
+            "The only way to do great work is to love what you do. "
+            "If you haven't found it yet, keep looking. Don't settle."
+        ),
+        "source": "Steve Jobs - Stanford Commencement Address 2005",
+        "tags": ["motivation", "career", "passion", "steve-jobs"],
+        "owner_id": "demo-user",
+        "created_at": datetime(2024, 1, 15, 10, 30, 0),
+        "updated_at": datetime(2024, 1, 15, 10, 30, 0),
+    },
+    {
+        "id": 2,
+        "text": "In the middle of difficulty lies opportunity.",
+        "source": "Albert Einstein",
+        "tags": ["opportunity", "challenges", "philosophy", "einstein"],
+        "owner_id": "demo-user",
+        "created_at": datetime(2024, 1, 20, 14, 15, 0),
+        "updated_at": datetime(2024, 1, 20, 14, 15, 0),
+    },
+)
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: datetime) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    return _EPOCH + value * _MICROSECOND
+
+
+class _Record:
+    """Stored highlight: epoch-microsecond timestamps and interned tag ids.
+
+    ``json`` caches the encoded API form, filled on the first serialized read.
+    """
+
+    __slots__ = (
+        "id",
+        "text",
+        "source",
+        "tag_ids",
+        "owner_id",
+        "created_at",
+        "updated_at",
+        "json",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        text: str,
+        source: str,
+        tag_ids: Tuple[int, ...],
+        owner_id: str,
+        created_at: int,
+        updated_at: int,
+    ):
+        self.id = id
+        self.text = text
+        self.source = source
+        self.tag_ids = tag_ids
+        self.owner_id = owner_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.json: Optional[bytes] = None
+
+
+def _created_range(
+    created_from: Optional[datetime], created_to: Optional[datetime]
+) -> Tuple[Optional[int], Optional[int]]:
+    return (
+        None if created_from is None else to_micros(created_from),
+        None if created_to is None else to_micros(created_to),
+    )
+
+
+def _searchable(record: _Record) -> str:
+    return f"{record.text} {record.source}"
+
+
+def _record_to_dict(record: _Record, tag_names: List[str]) -> dict:
+    return {
+        "id": record.id,
+        "text": record.text,
+        "source": record.source,
+        "tags": [tag_names[tag_id] for tag_id in record.tag_ids],
+        "owner_id": record.owner_id,
+        "created_at": from_micros(record.created_at),
+        "updated_at": from_micros(record.updated_at),
+    }
+
+
+_FIELD_GETTERS: Dict[str, Callable[[_Record, List[str]], Any]] = {
+    "id": lambda record, tag_names: record.id,
+    "text": lambda record, tag_names: record.text,
+    "source": lambda record, tag_names: record.source,
+    "tags": lambda record, tag_names: [tag_names[i] for i in record.tag_ids],
+    "owner_id": lambda record, tag_names: record.owner_id,
+    "created_at": lambda record, tag_names: from_micros(record.created_at),
+    "updated_at": lambda record, tag_names: from_micros(record.updated_at),
+}
+
+
+def _project(record: _Record, tag_names: List[str], fields: Sequence[str]) -> dict:
+    """Only the requested fields; the others are never converted"""
+    return {name: _FIELD_GETTERS[name](record, tag_names) for name in fields}
+
+
+class StoredHighlight(dict):
+    """Highlight dict read from a record; ``json()`` reuses the record's bytes.
+
+    Updates swap in a new ``_Record``, so a cached encoding never outlives the
+    version it was made from.
+    """
+
+    __slots__ = ("_record", "_tag_names")
+
+    def __init__(self, record: _Record, tag_names: List[str]):
+        super().__init__(_record_to_dict(record, tag_names))
+        self._record = record
+        self._tag_names = tag_names
+
+    def json(self) -> bytes:
+        return _record_json(self._record, self._tag_names)
+
+
+def _record_json(record: _Record, tag_names: List[str]) -> bytes:
+    return cached_dumps(record, lambda: _record_to_dict(record, tag_names))
+
+
+class StoredHighlights(Sequence):
+    """Highlights of a ``_View``; an item's dict is only built when it is read.
+
+    ``json_items()`` encodes straight from the records, so a list response
+    whose records are all cached converts none of them.
+    """
+
+    __slots__ = ("_view",)
+    __hash__ = None  # type: ignore[assignment]
+
+    def __init__(self, view: "_View"):
+        self._view = view
+
+    def __len__(self) -> int:
+        return len(self._view.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return StoredHighlight(self._view.records[index], self._view.tag_names)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (list, StoredHighlights)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def json_items(self) -> List[bytes]:
+        tag_names = self._view.tag_names
+        return [_record_json(record, tag_names) for record in self._view.records]
+
+
+class _View:
+    """Point-in-time set of records, converted to dicts outside the lock.
+
+    Writes never change a ``_Record`` in place, they swap in a new one (only
+    the derived ``json`` cache is filled in later), and the tag name table
+    only grows (reset replaces it), so holding references to the records and
+    the table is a consistent snapshot. Readers capture it under
+    the shared lock in O(n) pointer copies and build the API dicts afterwards,
+    so a long export does not hold writers back while it serializes.
+    """
+
+    __slots__ = ("records", "tag_names")
+
+    def __init__(self, records: List[_Record], tag_names: List[str]):
+        self.records = records
+        self.tag_names = tag_names
+
+    def to_dicts(self, fields: Optional[Sequence[str]] = None) -> Sequence[dict]:
+        if fields is None:
+            return StoredHighlights(self)
+        tag_names = self.tag_names
+        return [_project(record, tag_names, fields) for record in self.records]
 
 
 @dataclass
 class HighlightStorage:
-    """In-memory storage for highlights"""
+    """In-memory storage for highlights.
+
+    Records are kept compact and converted to the API dict shape on read.
+    Public methods take ``_lock`` (shared for reads, exclusive for writes);
+    underscore helpers assume the caller already holds it. List reads only
+    capture a ``_View`` under the lock and build their dicts after it.
+    """
+
+    blocking: ClassVar[bool] = False
 
-    _highlights: Dict[int, dict] = field(default_factory=dict)
+    _highlights: Dict[int, _Record] = field(default_factory=dict)
     _next_id: int = 1
+    _tag_ids: Dict[str, int] = field(default_factory=dict)
+    _tag_names: List[str] = field(default_factory=list)
+    _by_owner: Dict[str, OrderedIds] = field(default_factory=dict)
+    _by_tag: Dict[str, Dict[int, OrderedIds]] = field(default_factory=dict)
+    _by_source: Dict[str, Dict[str, OrderedIds]] = field(default_factory=dict)
+    _by_content: Dict[str, Dict[bytes, Tuple[int, ...]]] = field(default_factory=dict)
+    _search: SearchIndex = field(default_factory=SearchIndex)
+    _versions: Dict[str, int] = field(default_factory=dict)
+    _version_base: int = field(default_factory=time.time_ns)
+    journal: Optional[Journal] = None
+    _lock: RWLock = field(default_factory=RWLock, repr=False)
 
     def __post_init__(self):
-        self.reset_to_default()
+        if self.journal is None:
+            self.reset_to_default()
+        else:
+            self._recover()
+
+    def _intern_tags(self, tags: List[str]) -> Tuple[int, ...]:
+        tag_ids = []
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                tag_id = self._tag_ids[tag] = len(self._tag_names)
+                self._tag_names.append(sys.intern(tag))
+            tag_ids.append(tag_id)
+        return tuple(tag_ids)
+
+    def _to_record(self, highlight: dict) -> _Record:
+        created_at, updated_at = highlight["created_at"], highlight["updated_at"]
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+            updated_at = datetime.fromisoformat(updated_at)
+        return _Record(
+            highlight["id"],
+            highlight["text"],
+            sys.intern(highlight["source"]),
+            self._intern_tags(highlight["tags"]),
+            sys.intern(highlight["owner_id"]),
+            to_micros(created_at),
+            to_micros(updated_at),
+        )
+
+    def _to_dict(self, record: _Record) -> dict:
+        return _record_to_dict(record, self._tag_names)
 
     def reset_to_default(self) -> None:
-        self._highlights = {
-            1: {
-                "id": 1,
-                "text": (
-                    "The only way to do great work is to love what you do. "
-                    "If you haven't found it yet, keep looking. Don't settle."
-                ),
-                "source": "Steve Jobs - Stanford Commencement Address 2005",
-                "tags": ["motivation", "career", "passion", "steve-jobs"],
-                "owner_id": "demo-user",
-                "created_at": datetime(2024, 1, 15, 10, 30, 0),
-                "updated_at": datetime(2024, 1, 15, 10, 30, 0),
-            },
-            2: {
-                "id": 2,
-                "text": "In the middle of difficulty lies opportunity.",
-                "source": "Albert Einstein",
-                "tags": ["opportunity", "challenges", "philosophy", "einstein"],
-                "owner_id": "demo-user",
-                "created_at": datetime(2024, 1, 20, 14, 15, 0),
-                "updated_at": datetime(2024, 1, 20, 14, 15, 0),
-            },
+        with self._lock.write():
+            self._tag_ids = {}
+            self._tag_names = []
+            self._highlights = {h["id"]: self._to_record(h) for h in DEFAULT_HIGHLIGHTS}
+            self._next_id = max(self._highlights) + 1
+            self._rebuild_indexes()
+            self._versions = {}
+            self._version_base = time.time_ns()
+            if self.journal is not None:
+                self.journal.snapshot(self._state(), background=False)
+
+    def _state(self) -> Callable[[], dict]:
+        """Builder of the snapshot state; only record references are taken here.
+
+        Records are immutable and the tag table only grows, so the dicts can be
+        built later on the journal's thread without holding the lock.
+        """
+        records = list(self._highlights.values())
+        tag_names, next_id = self._tag_names, self._next_id
+        return lambda: {
+            "next_id": next_id,
+            "highlights": [_record_to_dict(r, tag_names) for r in records],
         }
-        self._next_id = 3
 
-    def get_all(self, owner_id: Optional[str] = None) -> List[dict]:
-        if owner_id is None:
-            return list(self._highlights.values())
-        return [h for h in self._highlights.values() if h.get("owner_id") == owner_id]
+    def _recover(self) -> None:
+        """Load the journal's latest snapshot and replay the records after it"""
+        snapshot, records = self.journal.load()
+        if snapshot is None and not records:
+            self.reset_to_default()
+            return
+
+        highlights = snapshot["highlights"] if snapshot else []
+        self._highlights = {h["id"]: self._to_record(h) for h in highlights}
+        self._next_id = snapshot["next_id"] if snapshot else 1
+        for entry in records:
+            if entry["op"] == "delete":
+                for highlight_id in entry.get("ids") or [entry["id"]]:
+                    self._highlights.pop(highlight_id, None)
+                continue
+            batch = (
+                entry["highlights"] if entry["op"] == "batch" else [entry["highlight"]]
+            )
+            for highlight in batch:
+                record = self._to_record(highlight)
+                self._highlights[record.id] = record
+                self._next_id = max(self._next_id, record.id + 1)
+        self._rebuild_indexes()
+
+    def _log(self, op: str, **fields) -> None:
+        if self.journal is None:
+            return
+        self.journal.append(op, **fields)
+        if self.journal.snapshot_due():
+            self.journal.snapshot(self._state())
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+
+    def _bump(self, owner_id: str) -> None:
+        self._versions[owner_id] = self._versions.get(owner_id, self._version_base) + 1
+
+    def version(self, owner_id: str) -> int:
+        """Counter bumped by every write to the owner's highlights.
+
+        Counters start from the clock when the storage is (re)loaded, so a
+        version seen before a restart or reset is never handed out again.
+        """
+        with self._lock.read():
+            return self._versions.get(owner_id, self._version_base)
+
+    def _rebuild_indexes(self) -> None:
+        self._by_owner = {}
+        self._by_tag = {}
+        self._by_source = {}
+        self._by_content = {}
+        self._search = SearchIndex()
+        for record in self._highlights.values():
+            self._index(record)
+
+    def _index(self, record: _Record) -> None:
+        owner_id = record.owner_id
+        key = (record.created_at, record.id)
+        self._by_owner.setdefault(owner_id, OrderedIds()).add(*key)
+        owner_tags = self._by_tag.setdefault(owner_id, {})
+        for tag_id in set(record.tag_ids):
+            owner_tags.setdefault(tag_id, OrderedIds()).add(*key)
+        owner_sources = self._by_source.setdefault(owner_id, {})
+        owner_sources.setdefault(record.source, OrderedIds()).add(*key)
+        self._search.add(owner_id, record.id, _searchable(record))
+        owner_content = self._by_content.setdefault(owner_id, {})
+        digest = content_hash(record.text, record.source)
+        owner_content[digest] = owner_content.get(digest, ()) + (record.id,)
+
+    def _unindex(self, record: _Record) -> None:
+        owner_id = record.owner_id
+        key = (record.created_at, record.id)
+        self._search.remove(owner_id, record.id, _searchable(record))
+        owner_content = self._by_content.get(owner_id, {})
+        digest = content_hash(record.text, record.source)
+        same = tuple(i for i in owner_content.get(digest, ()) if i != record.id)
+        if same:
+            owner_content[digest] = same
+        else:
+            owner_content.pop(digest, None)
+            if not owner_content:
+                self._by_content.pop(owner_id, None)
+        owner_tags = self._by_tag.get(owner_id, {})
+        for tag_id in set(record.tag_ids):
+            tag_ids = owner_tags.get(tag_id)
+            if tag_ids is None:
+                continue
+            tag_ids.discard(*key)
+            if not tag_ids:
+                del owner_tags[tag_id]
+        if not owner_tags:
+            self._by_tag.pop(owner_id, None)
+
+        owner_sources = self._by_source.get(owner_id, {})
+        source_ids = owner_sources.get(record.source)
+        if source_ids is not None:
+            source_ids.discard(*key)
+            if not source_ids:
+                del owner_sources[record.source]
+        if not owner_sources:
+            self._by_source.pop(owner_id, None)
+
+        owner_ids = self._by_owner.get(owner_id)
+        if owner_ids is None:
+            return
+        owner_ids.discard(*key)
+        if not owner_ids:
+            del self._by_owner[owner_id]
+
+    def _view(self, ids: Iterable[int]) -> _View:
+        highlights = self._highlights
+        return _View([highlights[i] for i in ids], self._tag_names)
+
+    def _ordered(
+        self, owner_id: str, tag: Optional[str] = None
+    ) -> Optional[OrderedIds]:
+        if tag is None:
+            return self._by_owner.get(owner_id)
+        tag_id = self._tag_ids.get(tag.lower())
+        return self._by_tag.get(owner_id, {}).get(tag_id)
+
+    def _indexes(
+        self, owner_id: str, tag: Optional[str], source: Optional[str]
+    ) -> Optional[List[OrderedIds]]:
+        """Indexes to intersect for the filters; None when one of them is empty"""
+        indexes = []
+        if tag is not None:
+            indexes.append(self._ordered(owner_id, tag))
+        if source is not None:
+            indexes.append(self._by_source.get(owner_id, {}).get(source))
+        if not indexes:
+            indexes.append(self._by_owner.get(owner_id))
+        if any(index is None for index in indexes):
+            return None
+        return indexes
+
+    def _select(
+        self,
+        owner_id: str,
+        tag: Optional[str] = None,
+        source: Optional[str] = None,
+        newest_first: bool = False,
+        after: Optional[Tuple[int, int]] = None,
+        created: Tuple[Optional[int], Optional[int]] = (None, None),
+    ) -> Iterator[int]:
+        """Ids of the owner's highlights matching every given filter, in order.
+
+        ``created`` is a [since, until) created_at range, bisected in the index.
+        With both tag and source the smaller index is walked and the other
+        filter is checked on each record.
+        """
+        indexes = self._indexes(owner_id, tag, source)
+        if indexes is None:
+            return iter(())
+        ids = min(indexes, key=len).ids(newest_first, after, *created)
+        if len(indexes) == 1:
+            return ids
+        tag_id, highlights = self._tag_ids[tag.lower()], self._highlights
+        return (
+            i
+            for i in ids
+            if highlights[i].source == source and tag_id in highlights[i].tag_ids
+        )
+
+    def count(
+        self,
+        owner_id: str,
+        tag: Optional[str] = None,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> int:
+        created = _created_range(created_from, created_to)
+        with self._lock.read():
+            indexes = self._indexes(owner_id, tag, source)
+            if indexes is None:
+                return 0
+            if len(indexes) == 1:
+                return indexes[0].count(*created)
+            return sum(1 for _ in self._select(owner_id, tag, source, created=created))
+
+    def tag_counts(self, owner_id: str) -> Dict[str, int]:
+        """Tag -> number of the owner's highlights, read off the tag index"""
+        with self._lock.read():
+            tag_names = self._tag_names
+            return {
+                tag_names[tag_id]: len(ordered)
+                for tag_id, ordered in self._by_tag.get(owner_id, {}).items()
+            }
+
+    def source_stats(self, owner_id: str) -> List[dict]:
+        """Per source: number of the owner's highlights and the latest created_at"""
+        with self._lock.read():
+            return [
+                {
+                    "source": source,
+                    "count": len(ordered),
+                    "latest_created_at": from_micros(ordered.latest()),
+                }
+                for source, ordered in self._by_source.get(owner_id, {}).items()
+            ]
+
+    def get_page(
+        self,
+        owner_id: str,
+        limit: int,
+        after: Optional[SortKey] = None,
+        tag: Optional[str] = None,
+        newest_first: bool = True,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[Sequence[dict], bool]:
+        """Keyset page of an owner's highlights.
+
+        Returns the page and whether more highlights follow it. ``after`` is the
+        (created_at, id) key of the last highlight of the previous page.
+        ``fields`` limits the dicts to those keys.
+        """
+        created = _created_range(created_from, created_to)
+        with self._lock.read():
+            start = None if after is None else (to_micros(after[0]), after[1])
+            ids = list(
+                islice(
+                    self._select(owner_id, tag, source, newest_first, start, created),
+                    limit + 1,
+                )
+            )
+            view = self._view(ids[:limit])
+        return view.to_dicts(fields), len(ids) > limit
+
+    def get_all(
+        self,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Sequence[dict]:
+        """Owner-scoped results come back ordered by created_at."""
+        created = _created_range(created_from, created_to)
+        with self._lock.read():
+            if owner_id is None:
+                view = self._view(self._highlights)
+            else:
+                view = self._view(
+                    self._select(
+                        owner_id,
+                        source=source,
+                        newest_first=newest_first,
+                        created=created,
+                    )
+                )
+        return view.to_dicts(fields)
 
     def get_by_id(
-        self, highlight_id: int, owner_id: Optional[str] = None
+        self,
+        highlight_id: int,
+        owner_id: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
     ) -> Optional[dict]:
-        highlight = self._highlights.get(highlight_id)
-        if highlight and owner_id is not None:
-            if highlight.get("owner_id") != owner_id:
+        with self._lock.read():
+            record = self._highlights.get(highlight_id)
+            if record is None:
                 return None
-        return highlight
+            if owner_id is not None and record.owner_id != owner_id:
+                return None
+            if fields is not None:
+                return _project(record, self._tag_names, fields)
+            return StoredHighlight(record, self._tag_names)
 
-    def get_by_tag(self, tag: str, owner_id: Optional[str] = None) -> List[dict]:
-        tag_lower = tag.lower()
-        results = [h for h in self._highlights.values() if tag_lower in h["tags"]]
-        if owner_id is not None:
-            results = [h for h in results if h.get("owner_id") == owner_id]
-        return results
+    def get_by_tag(
+        self,
+        tag: str,
+        owner_id: Optional[str] = None,
+        newest_first: bool = False,
+        source: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Sequence[dict]:
+        """Owner-scoped results come back ordered by created_at."""
+        created = _created_range(created_from, created_to)
+        with self._lock.read():
+            owners = list(self._by_tag) if owner_id is None else [owner_id]
+            ids: List[int] = []
+            for owner in owners:
+                ids.extend(
+                    self._select(owner, tag, source, newest_first, created=created)
+                )
+            view = self._view(ids)
+        return view.to_dicts(fields)
 
-    def create(self, text: str, source: str, tags: List[str], owner_id: str) -> dict:
-        now = datetime.now()
-        new_highlight = {
-            "id": self._next_id,
-            "text": text,
-            "source": source,
-            "tags": tags,
-            "owner_id": owner_id,
-            "created_at": now,
-            "updated_at": now,
-        }
-        self._highlights[self._next_id] = new_highlight
+    def search(
+        self, query: str, owner_id: str, limit: int = 20, partial: bool = False
+    ) -> Sequence[dict]:
+        """Owner's highlights matching ``query`` in text or source, best first"""
+        with self._lock.read():
+            hits = self._search.search(owner_id, query, limit=limit, partial=partial)
+            view = self._view(highlight_id for highlight_id, _ in hits)
+        return view.to_dicts()
+
+    def _create(self, text: str, source: str, tags: List[str], owner_id: str) -> dict:
+        now = to_micros(datetime.now())
+        record = _Record(
+            self._next_id,
+            text,
+            sys.intern(source),
+            self._intern_tags(tags),
+            sys.intern(owner_id),
+            now,
+            now,
+        )
+        self._highlights[record.id] = record
+        self._index(record)
         self._next_id += 1
+        self._bump(record.owner_id)
+        new_highlight = self._to_dict(record)
+        self._log("create", highlight=new_highlight)
         return new_highlight
 
+    def create(self, text: str, source: str, tags: List[str], owner_id: str) -> dict:
+        with self._lock.write():
+            return self._create(text, source, tags, owner_id)
+
+    def create_unique(
+        self, text: str, source: str, tags: List[str], owner_id: str
+    ) -> Tuple[dict, bool]:
+        """Create unless the owner already has this text and source.
+
+        Returns the new or the existing highlight and whether it was created.
+        """
+        with self._lock.write():
+            digest = content_hash(text, source)
+            same = self._by_content.get(owner_id, {}).get(digest)
+            if same:
+                return self._to_dict(self._highlights[same[0]]), False
+            return self._create(text, source, tags, owner_id), True
+
+    def create_many(self, items: List[dict], owner_id: str) -> List[dict]:
+        """Create every item (text, source, tags) in one atomic write"""
+        with self._lock.write():
+            now = to_micros(datetime.now())
+            owner_id = sys.intern(owner_id)
+            records = [
+                _Record(
+                    self._next_id + offset,
+                    item["text"],
+                    sys.intern(item["source"]),
+                    self._intern_tags(item["tags"]),
+                    owner_id,
+                    now,
+                    now,
+                )
+                for offset, item in enumerate(items)
+            ]
+            for record in records:
+                self._highlights[record.id] = record
+                self._index(record)
+            self._next_id += len(records)
+            if records:
+                self._bump(owner_id)
+            created = [self._to_dict(record) for record in records]
+            self._log("batch", highlights=created)
+            return created
+
     def update(
         self, highlight_id: int, update_data: dict, owner_id: Optional[str] = None
     ) -> Optional[dict]:
-        if highlight_id not in self._highlights:
-            return None
-
-        highlight = self._highlights[highlight_id]
-        if owner_id is not None and highlight.get("owner_id") != owner_id:
-            return None
+        with self._lock.write():
+            record = self._highlights.get(highlight_id)
+            if record is None:
+                return None
+            if owner_id is not None and record.owner_id != owner_id:
+                return None
+            if not update_data:
+                return self._to_dict(record)
 
-        if update_data:
-            highlight.update(update_data)
-            highlight["updated_at"] = datetime.now()
-        return highlight
+            tags = update_data.get("tags")
+            updated = _Record(
+                record.id,
+                update_data.get("text", record.text),
+                sys.intern(update_data.get("source", record.source)),
+                record.tag_ids if tags is None else self._intern_tags(tags),
+                record.owner_id,
+                record.created_at,
+                to_micros(datetime.now()),
+            )
+            self._unindex(record)
+            self._highlights[highlight_id] = updated
+            self._index(updated)
+            self._bump(record.owner_id)
+            highlight = self._to_dict(updated)
+            self._log("update", highlight=highlight)
+            return highlight
 
     def delete(
         self, highlight_id: int, owner_id: Optional[str] = None
     ) -> Optional[dict]:
-        highlight = self._highlights.get(highlight_id)
-        if highlight and owner_id is not None:
-            if highlight.get("owner_id") != owner_id:
+        with self._lock.write():
+            record = self._highlights.get(highlight_id)
+            if record is None:
+                return None
+            if owner_id is not None and record.owner_id != owner_id:
                 return None
-        return self._highlights.pop(highlight_id, None)
+            del self._highlights[highlight_id]
+            self._unindex(record)
+            self._bump(record.owner_id)
+            self._log("delete", id=highlight_id)
+            return self._to_dict(record)
+
+    def _retag(self, owner_id: str, tag: str, replacement: Optional[str]) -> int:
+        """Swap ``tag`` for ``replacement`` (or drop it) on the owner's highlights"""
+        owner_tags = self._by_tag.get(owner_id, {})
+        old_id = self._tag_ids.get(tag.lower())
+        if old_id not in owner_tags or replacement == self._tag_names[old_id]:
+            return 0
+        new_id = self._intern_tags([replacement])[0] if replacement else None
+
+        ordered = owner_tags.pop(old_id)
+        target = None if new_id is None else owner_tags.setdefault(new_id, OrderedIds())
+        now = to_micros(datetime.now())
+        changed = []
+        for highlight_id in ordered.ids():
+            record = self._highlights[highlight_id]
+            tag_ids = []
+            # ``tag`` may be listed more than once; it becomes one ``new_id``.
+            added = target is None or new_id in record.tag_ids
+            for tag_id in record.tag_ids:
+                if tag_id != old_id:
+                    tag_ids.append(tag_id)
+                elif not added:
+                    tag_ids.append(new_id)
+                    target.add(record.created_at, record.id)
+                    added = True
+            updated = _Record(
+                record.id,
+                record.text,
+                record.source,
+                tuple(tag_ids),
+                record.owner_id,
+                record.created_at,
+                now,
+            )
+            self._highlights[highlight_id] = updated
+            changed.append(self._to_dict(updated))
+        if not owner_tags:
+            del self._by_tag[owner_id]
+
+        self._bump(owner_id)
+        self._log("batch", highlights=changed)
+        return len(changed)
+
+    def rename_tag(self, owner_id: str, tag: str, new_tag: str) -> int:
+        """Rename a tag across the owner's highlights; returns how many changed"""
+        with self._lock.write():
+            return self._retag(owner_id, tag, new_tag)
+
+    def remove_tag(self, owner_id: str, tag: str) -> int:
+        """Drop a tag from the owner's highlights; returns how many changed"""
+        with self._lock.write():
+            return self._retag(owner_id, tag, None)
+
+    def delete_by_tag(self, owner_id: str, tag: str) -> int:
+        """Delete the owner's highlights carrying ``tag``; returns how many"""
+        with self._lock.write():
+            ordered = self._ordered(owner_id, tag)
+            if ordered is None:
+                return 0
+            ids = list(dict.fromkeys(ordered.ids()))
+            for highlight_id in ids:
+                self._unindex(self._highlights.pop(highlight_id))
+            self._bump(owner_id)
+            self._log("delete", ids=ids)
+            return len(ids)
 
     def exists(self, highlight_id: int) -> bool:
-        return highlight_id in self._highlights
+        with self._lock.read():
+            return highlight_id in self._highlights
+
+
+def create_storage(
+    database_url: Optional[str] = None, journal_dir: Optional[str] = None
+):
+    """Pick the storage engine for ``DATABASE_URL`` (in-memory when unset).
+
+    The in-memory engine persists through a journal when ``journal_dir`` is set.
+    """
+    if not database_url:
+        journal = None
+        if journal_dir:
+            journal = Journal(
+                journal_dir,
+                fsync_interval=config.journal_fsync_interval_ms / 1000,
+                snapshot_every=config.journal_snapshot_every,
+            )
+        return HighlightStorage(journal=journal)
+    if database_url.startswith("sqlite:"):
+        from app.sqlite_storage import SQLiteHighlightStorage
+
+        return SQLiteHighlightStorage(sqlite_path(database_url))
+    scheme = database_url.split(":", 1)[0]
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {scheme}")
 
 
-storage = HighlightStorage()
+storage = create_storage(config.database_url, journal_dir=config.journal_dir)
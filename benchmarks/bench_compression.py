@@ -0,0 +1,71 @@
+"""Bytes on the wire and CPU per request with response compression.
+
+Run with ``python -m benchmarks.bench_compression``. Each encoding fetches the
+1k-highlight list and the markdown export through the production app
+in-process; "identity" is the uncompressed baseline. CPU is process time per
+request, so it includes routing and serialization, not only compression;
+bodies are read raw, without client-side decoding.
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from app import compression
+from app.config import config
+from app.main import app
+from app.security.jwt import issue_access_token
+from app.storage import storage
+
+ITEMS = 1_000
+REQUESTS = 100
+PATHS = ("/highlights", "/highlights/export/markdown")
+
+
+async def fetch_raw(client: httpx.AsyncClient, path: str, headers: dict) -> int:
+    """Bytes received, left encoded so the client does not pay to decode them"""
+    async with client.stream("GET", path, headers=headers) as response:
+        assert response.status_code == 200
+        return sum([len(chunk) async for chunk in response.aiter_raw()])
+
+
+async def measure(path: str, headers: dict) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        wire = await fetch_raw(client, path, headers)
+        start = time.process_time()
+        for _ in range(REQUESTS):
+            await fetch_raw(client, path, headers)
+        return wire, (time.process_time() - start) / REQUESTS
+
+
+def main() -> None:
+    config.secret_key = config.secret_key or "bench-secret-key"
+    storage.create_many(
+        [
+            {
+                "text": f"Highlight {n}: " + "a sentence worth remembering. " * 8,
+                "source": f"Book {n % 20}",
+                "tags": ["bench", f"topic-{n % 7}"],
+            }
+            for n in range(ITEMS)
+        ],
+        owner_id="bench-user",
+    )
+    token = issue_access_token(sub="bench-user")
+
+    for path in PATHS:
+        for encoding in ("identity", *compression.ENCODERS):
+            headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": encoding}
+            wire, cpu = asyncio.run(measure(path, headers))
+            print(
+                f"{path:<28} {encoding:<9} {wire / 1024:8.1f} KiB "
+                f"{cpu * 1000:6.2f} ms CPU/request"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Throughput of GET /highlights at 1k concurrent connections.
+
+Run with ``python -m benchmarks.bench_concurrency``. "before" mounts the old
+plain ``def`` handler, which Starlette runs in its bounded thread pool;
+"after" is the same handler as ``async def`` reading through
+``async_storage``. Both apps carry the production middleware.
+Requests go through the ASGI stack in-process, so the numbers isolate the
+framework/threading overhead from the network.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+from fastapi import Depends, FastAPI, Query
+
+from app.async_storage import async_storage
+from app.config import config
+from app.middleware import CorrelationIdMiddleware
+from app.models import Highlight, HighlightListResponse
+from app.security.authorization import AuthUser, require_auth
+from app.security.jwt import issue_access_token
+from app.storage import storage
+
+CONCURRENCY = 1_000
+ROUNDS = 5
+
+before = FastAPI()
+before.add_middleware(CorrelationIdMiddleware)
+after = FastAPI()
+after.add_middleware(CorrelationIdMiddleware)
+
+
+@before.get("/highlights", response_model=HighlightListResponse)
+def sync_get_highlights(
+    tag: Optional[str] = Query(None),
+    user: AuthUser = Depends(require_auth),
+):
+    highlights = storage.get_all(owner_id=user.sub, newest_first=True)
+    return HighlightListResponse(
+        highlights=[Highlight(**h) for h in highlights], total=len(highlights)
+    )
+
+
+@after.get("/highlights", response_model=HighlightListResponse)
+async def async_get_highlights(
+    tag: Optional[str] = Query(None),
+    user: AuthUser = Depends(require_auth),
+):
+    highlights = await async_storage.get_all(owner_id=user.sub, newest_first=True)
+    return HighlightListResponse(
+        highlights=[Highlight(**h) for h in highlights], total=len(highlights)
+    )
+
+
+async def measure(target: FastAPI, headers: dict) -> float:
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.get("/highlights", headers=headers)
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            responses = await asyncio.gather(
+                *(
+                    client.get("/highlights", headers=headers)
+                    for _ in range(CONCURRENCY)
+                )
+            )
+            assert all(r.status_code == 200 for r in responses)
+        return CONCURRENCY * ROUNDS / (time.perf_counter() - start)
+
+
+def main() -> None:
+    config.secret_key = config.secret_key or "bench-secret-key"
+    headers = {"Authorization": f"Bearer {issue_access_token(sub='demo-user')}"}
+
+    for name, target in (("before (def)", before), ("after (async)", after)):
+        rps = asyncio.run(measure(target, headers))
+        print(f"{name:<14} {CONCURRENCY} concurrent: {rps:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Startup recovery time of the journaled in-memory store.
+
+Run with ``python -m benchmarks.bench_journal_recovery [records]`` (default
+1M). Two layouts are measured: a journal holding every create, and a compact
+snapshot of the same records followed by a 1% journal tail.
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from app.journal import Journal
+from app.storage import HighlightStorage
+
+DEFAULT_RECORDS = 1_000_000
+OWNERS = 1_000
+
+
+def make_highlight(n: int, now: datetime) -> dict:
+    return {
+        "id": n,
+        "text": f"highlight number {n} about topic {n % 97}",
+        "source": f"Book {n % 500}",
+        "tags": [f"tag{n % 20}", f"tag{n % 7}"],
+        "owner_id": f"user-{n % OWNERS}",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def write_journal(directory: str, first: int, last: int) -> None:
+    journal = Journal(directory, fsync_interval=60)
+    journal.load()
+    now = datetime.now()
+    for n in range(first, last + 1):
+        journal.append("create", highlight=make_highlight(n, now))
+    journal.close()
+
+
+def write_snapshot(directory: str, records: int) -> None:
+    journal = Journal(directory, fsync_interval=60)
+    journal.load()
+    now = datetime.now()
+    highlights = [make_highlight(n, now) for n in range(1, records + 1)]
+    journal.snapshot(
+        lambda: {"next_id": records + 1, "highlights": highlights}, background=False
+    )
+    journal.close()
+
+
+def recover(directory: str) -> float:
+    start = time.perf_counter()
+    store = HighlightStorage(journal=Journal(directory, fsync_interval=60))
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed
+
+
+def main() -> None:
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RECORDS
+    tail = records // 100
+
+    directory = tempfile.mkdtemp(prefix="journal-bench-")
+    try:
+        write_journal(directory, 1, records)
+        print(f"journal only      {records} records: {recover(directory):6.1f}s")
+    finally:
+        shutil.rmtree(directory)
+
+    directory = tempfile.mkdtemp(prefix="journal-bench-")
+    try:
+        write_snapshot(directory, records - tail)
+        write_journal(directory, records - tail + 1, records)
+        print(f"snapshot + {tail} tail {records} records: {recover(directory):6.1f}s")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
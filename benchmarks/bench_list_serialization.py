@@ -0,0 +1,81 @@
+"""Throughput of GET /highlights returning 1k highlights.
+
+Run with ``python -m benchmarks.bench_list_serialization``. "before" builds
+``Highlight(**h)`` per item and lets FastAPI validate and serialize the
+``response_model``; "after" is the production route, which writes the
+storage dicts straight to JSON bytes (orjson when installed, stdlib json
+otherwise). Requests go through the ASGI stack in-process.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+from fastapi import Depends, FastAPI, Query
+
+from app import serialization
+from app.async_storage import async_storage
+from app.config import config
+from app.main import app
+from app.middleware import CorrelationIdMiddleware
+from app.models import Highlight, HighlightListResponse
+from app.security.authorization import AuthUser, require_auth
+from app.security.jwt import issue_access_token
+from app.storage import storage
+
+ITEMS = 1_000
+REQUESTS = 200
+
+before = FastAPI()
+before.add_middleware(CorrelationIdMiddleware)
+
+
+@before.get("/highlights", response_model=HighlightListResponse)
+async def model_get_highlights(
+    tag: Optional[str] = Query(None),
+    user: AuthUser = Depends(require_auth),
+):
+    highlights = await async_storage.get_all(owner_id=user.sub, newest_first=True)
+    return HighlightListResponse(
+        highlights=[Highlight(**h) for h in highlights], total=len(highlights)
+    )
+
+
+async def measure(target: FastAPI, headers: dict) -> float:
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        response = await client.get("/highlights", headers=headers)
+        assert len(response.json()["highlights"]) == ITEMS
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            response = await client.get("/highlights", headers=headers)
+            assert response.status_code == 200
+        return REQUESTS / (time.perf_counter() - start)
+
+
+def main() -> None:
+    config.secret_key = config.secret_key or "bench-secret-key"
+    storage.create_many(
+        [
+            {"text": f"Highlight {n} " * 10, "source": "Bench", "tags": ["bench"]}
+            for n in range(ITEMS)
+        ],
+        owner_id="bench-user",
+    )
+    headers = {"Authorization": f"Bearer {issue_access_token(sub='bench-user')}"}
+
+    runs = [("before (model)", before, None), ("after (stdlib)", app, False)]
+    if serialization.ORJSON_AVAILABLE:
+        runs.append(("after (orjson)", app, True))
+    for name, target, use_orjson in runs:
+        if use_orjson is not None:
+            serialization.ORJSON_AVAILABLE = use_orjson
+        rps = asyncio.run(measure(target, headers))
+        print(f"{name:<15} {ITEMS} items: {rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Per-owner read latency as the number of other tenants grows.
+
+Run with ``python -m benchmarks.bench_owner_index``. With the owner index in
+place the numbers stay flat: a user with five highlights pays the same no
+matter how many other users share the process.
+"""
+
+import timeit
+
+from app.storage import HighlightStorage
+
+TENANT_COUNTS = [10, 1_000, 10_000, 50_000]
+PER_TENANT = 5
+REPEAT = 2_000
+
+
+def build_storage(tenants: int) -> HighlightStorage:
+    store = HighlightStorage()
+    for tenant in range(tenants):
+        for n in range(PER_TENANT):
+            store.create(f"text {n}", f"source {n}", ["bench"], f"user-{tenant}")
+    return store
+
+
+def main() -> None:
+    print(f"{'tenants':>10} {'records':>10} {'get_all us':>12} {'get_by_tag us':>14}")
+    for tenants in TENANT_COUNTS:
+        store = build_storage(tenants)
+        get_all = timeit.timeit(lambda: store.get_all(owner_id="user-0"), number=REPEAT)
+        get_by_tag = timeit.timeit(
+            lambda: store.get_by_tag("bench", owner_id="user-0"), number=REPEAT
+        )
+        print(
+            f"{tenants:>10} {len(store.get_all()):>10} "
+            f"{get_all / REPEAT * 1e6:>12.2f} {get_by_tag / REPEAT * 1e6:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
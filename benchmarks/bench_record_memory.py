@@ -0,0 +1,51 @@
+"""Bytes per stored highlight: plain dicts vs compact records.
+
+Run with ``python -m benchmarks.bench_record_memory``. "before" keeps each
+highlight as the seven-key dict with two datetimes and its own tags list, the
+way HighlightStorage used to; "after" keeps the ``__slots__`` records the store
+uses now. Inputs are built the same way for both, so the difference is the
+representation.
+"""
+
+import tracemalloc
+from datetime import datetime
+
+from app.storage import HighlightStorage
+
+RECORDS = 100_000
+
+
+def make_highlight(n: int) -> dict:
+    now = datetime.now()
+    return {
+        "id": n,
+        "text": f"highlight {n}",
+        "source": f"Book {n % 500}",
+        "tags": [f"tag{n % 20}", f"topic{n % 7}", "reading"],
+        "owner_id": f"user-{n % 1_000}",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def measure(keep) -> float:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    kept = [keep(make_highlight(n)) for n in range(RECORDS)]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del kept
+    return used / RECORDS
+
+
+def main() -> None:
+    store = HighlightStorage()
+    before = measure(lambda highlight: highlight)
+    after = measure(store._to_record)
+    print(f"before (dict):   {before:7.1f} bytes/highlight")
+    print(f"after (record):  {after:7.1f} bytes/highlight")
+    print(f"saved:           {1 - after / before:7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Full-text search latency over 100k+ highlights.
+
+Run with ``python -m benchmarks.bench_search``. Highlights are spread across
+tenants the way production data is; queries run against one owner's index.
+"""
+
+import random
+import time
+
+from app.storage import HighlightStorage
+
+HIGHLIGHTS = 100_000
+OWNERS = 100
+QUERIES = 2_000
+WORDS = [f"word{i}" for i in range(5_000)]
+
+
+def build_storage(rng: random.Random) -> HighlightStorage:
+    store = HighlightStorage()
+    for n in range(HIGHLIGHTS):
+        text = " ".join(rng.choices(WORDS, k=20))
+        source = " ".join(rng.choices(WORDS, k=3))
+        store.create(text, source, [], f"user-{n % OWNERS}")
+    return store
+
+
+def measure(store: HighlightStorage, rng: random.Random, partial: bool) -> list[float]:
+    timings = []
+    for _ in range(QUERIES):
+        owner = f"user-{rng.randrange(OWNERS)}"
+        query = " ".join(rng.choices(WORDS, k=2))
+        if partial:
+            query = query[1:-1]
+        start = time.perf_counter()
+        store.search(query, owner_id=owner, partial=partial)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+def main() -> None:
+    rng = random.Random(42)
+    start = time.perf_counter()
+    store = build_storage(rng)
+    print(f"indexed {HIGHLIGHTS} highlights in {time.perf_counter() - start:.1f}s")
+
+    for partial in (False, True):
+        timings = measure(store, rng, partial)
+        p50 = timings[len(timings) // 2] * 1e3
+        p99 = timings[int(len(timings) * 0.99)] * 1e3
+        print(f"partial={partial!s:<5} p50={p50:.3f}ms p99={p99:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
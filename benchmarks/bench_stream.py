@@ -0,0 +1,89 @@
+"""Peak memory of GET /highlights vs GET /highlights/stream.
+
+Run with ``python -m benchmarks.bench_stream``. Both routes serve the same
+owner's highlights from the production ASGI app, called directly with a
+``send`` that drops each body chunk as a network socket would. Every path is
+requested once before measuring, so filling the per-record JSON cache is not
+counted; tracemalloc reports the peak allocated while answering.
+"""
+
+import asyncio
+import tracemalloc
+
+from app.config import config
+from app.main import app
+from app.security.jwt import issue_access_token
+from app.storage import storage
+
+SIZES = (10_000, 50_000)
+
+
+async def request(path: str, headers: dict) -> int:
+    """Serve one GET and return the body size"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "server": ("bench", 80),
+        "client": ("bench", 1),
+    }
+    received = False
+    size = 0
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+def peak(path: str, headers: dict) -> int:
+    asyncio.run(request(path, headers))
+    tracemalloc.start()
+    asyncio.run(request(path, headers))
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_bytes
+
+
+def main() -> None:
+    config.secret_key = config.secret_key or "bench-secret-key"
+    headers = {
+        "Authorization": f"Bearer {issue_access_token(sub='bench-user')}",
+        "Accept-Encoding": "identity",
+    }
+    loaded = 0
+    for size in SIZES:
+        storage.create_many(
+            [
+                {"text": f"Highlight {n} " * 20, "source": "Bench", "tags": ["bench"]}
+                for n in range(loaded, size)
+            ],
+            owner_id="bench-user",
+        )
+        loaded = size
+        for path in ("/highlights", "/highlights/stream"):
+            mib = peak(path, headers) / 2**20
+            print(f"{path:<20} {size:>6} highlights: peak {mib:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.async_storage import AsyncStorageAdapter
+from app.sqlite_storage import SQLiteHighlightStorage
+from app.storage import HighlightStorage
+
+
+@pytest.mark.parametrize("engine_cls", [HighlightStorage, SQLiteHighlightStorage])
+def test_adapter_round_trip(engine_cls):
+    adapter = AsyncStorageAdapter(engine_cls())
+
+    async def scenario():
+        created = await adapter.create("Async text", "Async source", ["io"], "alice")
+        updated = await adapter.update(created["id"], {"tags": ["aio"]}, "alice")
+        tagged = await adapter.get_by_tag("aio", owner_id="alice")
+        deleted = await adapter.delete(created["id"], owner_id="alice")
+        return updated, tagged, deleted, await adapter.get_all(owner_id="alice")
+
+    updated, tagged, deleted, remaining = asyncio.run(scenario())
+
+    assert updated["tags"] == ["aio"]
+    assert [h["id"] for h in tagged] == [updated["id"]]
+    assert deleted["id"] == updated["id"]
+    assert remaining == []
+
+
+def test_adapter_runs_memory_engine_inline():
+    engine = HighlightStorage()
+    calling_threads = []
+    original = engine.get_all
+
+    def recording_get_all(*args, **kwargs):
+        calling_threads.append(threading.get_ident())
+        return original(*args, **kwargs)
+
+    engine.get_all = recording_get_all
+
+    async def scenario():
+        await AsyncStorageAdapter(engine).get_all(owner_id="demo-user")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+
+    assert calling_threads == [loop_thread]
@@ -0,0 +1,134 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, choose_encoding
+
+LARGE = json.dumps([{"text": "repeated highlight text"}] * 200).encode()
+
+
+async def large(request):
+    return Response(LARGE, media_type="application/json", headers={"ETag": '"v1"'})
+
+
+async def small(request):
+    return Response(b'{"ok":true}', media_type="application/json")
+
+
+async def image(request):
+    return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+
+async def stream(request):
+    async def lines():
+        for n in range(3):
+            yield json.dumps({"n": n}).encode() + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+app = Starlette(
+    routes=[
+        Route("/large", large),
+        Route("/small", small),
+        Route("/image", image),
+        Route("/stream", stream),
+    ]
+)
+app.add_middleware(CompressionMiddleware)
+client = TestClient(app)
+
+
+def test_large_json_is_gzipped():
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert response.content == LARGE
+    assert int(response.headers["Content-Length"]) < len(LARGE) // 10
+
+
+@pytest.mark.parametrize(
+    "path, accept",
+    [
+        ("/small", "gzip"),
+        ("/image", "gzip"),
+        ("/large", "identity"),
+        ("/large", "gzip;q=0"),
+    ],
+)
+def test_response_is_left_alone(path, accept):
+    response = client.get(path, headers={"Accept-Encoding": accept})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_streamed_chunks_are_flushed_as_they_arrive():
+    messages = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "server": ("test", 80),
+        "client": ("test", 1),
+    }
+    asyncio.run(app(scope, receive, send))
+
+    start, *chunks = messages
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    decompressor = zlib.decompressobj(31)
+    first = decompressor.decompress(chunks[0]["body"])
+    assert first == b'{"n": 0}\n'
+    body = first + b"".join(decompressor.decompress(c["body"]) for c in chunks[1:])
+    assert body.splitlines() == [json.dumps({"n": n}).encode() for n in range(3)]
+    assert gzip.decompress(b"".join(c["body"] for c in chunks)) == body
+
+
+def test_choose_encoding_prefers_zstd_when_installed(monkeypatch):
+    monkeypatch.setattr(
+        compression, "ENCODERS", {"zstd": object, "gzip": compression._Gzip}
+    )
+    assert choose_encoding("gzip, zstd") == "zstd"
+    assert choose_encoding("gzip, zstd;q=0") == "gzip"
+    assert choose_encoding("br") is None
+    assert choose_encoding("*") == "zstd"
+
+
+def test_choose_encoding_honours_explicit_refusal_over_wildcard(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODERS", {"gzip": compression._Gzip})
+    assert choose_encoding("gzip;q=0, *") is None
+    assert choose_encoding("*, gzip;q=0") is None
+    assert choose_encoding("identity, *") == "gzip"
+
+
+@pytest.mark.skipif(not compression.ZSTD_AVAILABLE, reason="zstandard not installed")
+def test_large_json_is_zstd_encoded():
+    import zstandard
+
+    response = client.get("/large", headers={"Accept-Encoding": "zstd"})
+
+    assert response.headers["Content-Encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompress(response.content) == LARGE
@@ -1,10 +1,19 @@
+import base64
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
+from app import idempotency
+from app.async_storage import async_storage
 from app.config import config
-from app.main import app
+from app.idempotency import idempotency_cache
+from app.main import BATCH_ITEMS_PER_MINUTE, app
+from app.models import MAX_BATCH_SIZE
+from app.rate_limiter import rate_limiter
 from app.security.jwt import clear_denylist, issue_access_token
-from app.storage import storage
+from app.shared_state import SQLiteIdempotencyCache
+from app.storage import HighlightStorage, storage
 
 client = TestClient(app)
 
@@ -15,10 +24,14 @@ def setup():
     config.secret_key = "test-secret-key"
     storage.reset_to_default()
     clear_denylist()
+    rate_limiter.reset()
+    idempotency_cache.clear()
     yield
     config.secret_key = original_key
     storage.reset_to_default()
     clear_denylist()
+    rate_limiter.reset()
+    idempotency_cache.clear()
 
 
 @pytest.fixture
@@ -33,6 +46,34 @@ def test_health_check():
     assert response.json() == {"status": "ok"}
 
 
+@pytest.fixture
+def admin_headers():
+    token = issue_access_token(sub="admin-user", role="admin")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_metrics_require_admin(auth_headers, admin_headers):
+    assert client.get("/metrics", headers=auth_headers).status_code == 403
+    response = client.get("/metrics", headers=admin_headers)
+    assert response.status_code == 200
+    assert set(response.json()["json_cache"]) >= {"hit_ratio", "cpu_seconds_saved"}
+
+
+@pytest.mark.skipif(
+    not isinstance(storage, HighlightStorage),
+    reason="the JSON cache lives in the in-memory engine",
+)
+def test_metrics_report_json_cache_hits(auth_headers, admin_headers):
+    before = client.get("/metrics", headers=admin_headers).json()["json_cache"]
+    client.get("/highlights", headers=auth_headers)
+    client.get("/highlights", headers=auth_headers)
+    client.get("/highlights/1", headers=auth_headers)
+
+    after = client.get("/metrics", headers=admin_headers).json()["json_cache"]
+    assert after["hits"] - before["hits"] >= 3
+    assert 0 < after["hit_ratio"] <= 1
+
+
 def test_get_all_highlights(auth_headers):
     response = client.get("/highlights", headers=auth_headers)
     assert response.status_code == 200
@@ -242,3 +283,503 @@ def test_create_highlight_tag_normalization(auth_headers):
 
     expected_tags = ["uppercase", "mixed-case", "normal"]
     assert set(data["highlight"]["tags"]) == set(expected_tags)
+
+
+def test_highlights_keyset_pagination(auth_headers):
+    for i in range(3):
+        client.post(
+            "/highlights",
+            json={"text": f"Paged {i}", "source": "Pager", "tags": []},
+            headers=auth_headers,
+        )
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/highlights", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 5
+        assert len(data["highlights"]) <= 2
+        seen.extend(h["id"] for h in data["highlights"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    full = client.get("/highlights", headers=auth_headers).json()
+    assert seen == [h["id"] for h in full["highlights"]]
+    assert full["next_cursor"] is None
+
+
+def test_highlights_pagination_with_tag(auth_headers):
+    response = client.get(
+        "/highlights", params={"tag": "einstein", "limit": 1}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [h["id"] for h in data["highlights"]] == [2]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.parametrize(
+    "raw", ["2024-01-01T00:00:00+00:00|1", f"2024-01-01T00:00:00|{2**63}"]
+)
+def test_highlights_rejects_out_of_range_cursor(auth_headers, raw):
+    cursor = base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    response = client.get(
+        "/highlights", params={"cursor": cursor}, headers=auth_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["type"] == "/errors/invalid-cursor"
+
+
+def test_highlights_invalid_cursor(auth_headers):
+    response = client.get(
+        "/highlights", params={"cursor": "not-a-cursor"}, headers=auth_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["type"] == "/errors/invalid-cursor"
+
+
+def test_search_highlights(auth_headers):
+    response = client.get("/highlights/search?q=einstein", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [h["id"] for h in data["highlights"]] == [2]
+
+
+def test_search_highlights_partial(auth_headers):
+    response = client.get(
+        "/highlights/search",
+        params={"q": "commence", "partial": True},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert [h["id"] for h in response.json()["highlights"]] == [1]
+
+
+def test_search_highlights_requires_query(auth_headers):
+    response = client.get("/highlights/search", headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_create_highlights_batch(auth_headers):
+    items = [
+        {"text": f"Batch {i}", "source": "Importer", "tags": ["Kindle"]}
+        for i in range(3)
+    ]
+    response = client.post(
+        "/highlights/batch", json={"items": items}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["total"] == 3
+    assert [item["index"] for item in data["created"]] == [0, 1, 2]
+
+    tagged = client.get("/highlights?tag=kindle", headers=auth_headers).json()
+    assert {h["id"] for h in tagged["highlights"]} == {
+        item["id"] for item in data["created"]
+    }
+
+
+def test_create_highlights_batch_is_all_or_nothing(auth_headers):
+    items = [
+        {"text": "Valid", "source": "Importer", "tags": []},
+        {"text": "", "source": "Importer", "tags": []},
+    ]
+    response = client.post(
+        "/highlights/batch", json={"items": items}, headers=auth_headers
+    )
+    assert response.status_code == 422
+    assert client.get("/highlights", headers=auth_headers).json()["total"] == 2
+
+
+def test_create_highlights_batch_size_limit(auth_headers):
+    items = [{"text": "x", "source": "y", "tags": []}] * (MAX_BATCH_SIZE + 1)
+    response = client.post(
+        "/highlights/batch", json={"items": items}, headers=auth_headers
+    )
+    assert response.status_code == 422
+
+
+def test_create_highlights_batch_rate_limit_counts_items(auth_headers):
+    items = [{"text": "x", "source": "y", "tags": []}] * MAX_BATCH_SIZE
+    for _ in range(BATCH_ITEMS_PER_MINUTE // MAX_BATCH_SIZE):
+        response = client.post(
+            "/highlights/batch", json={"items": items}, headers=auth_headers
+        )
+        assert response.status_code == 201
+
+    response = client.post(
+        "/highlights/batch", json={"items": items[:1]}, headers=auth_headers
+    )
+    assert response.status_code == 429
+
+
+def test_rename_tag(auth_headers):
+    response = client.put(
+        "/highlights/tags/motivation", json={"name": " Drive "}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["tag"] == "drive"
+    assert response.json()["affected"] == 1
+
+    tagged = client.get("/highlights?tag=drive", headers=auth_headers).json()
+    assert tagged["total"] == 1
+    assert (
+        client.get("/highlights?tag=motivation", headers=auth_headers).json()["total"]
+        == 0
+    )
+
+
+def test_rename_tag_rejects_blank_name(auth_headers):
+    response = client.put(
+        "/highlights/tags/motivation", json={"name": "  "}, headers=auth_headers
+    )
+    assert response.status_code == 422
+
+
+def test_remove_tag(auth_headers):
+    response = client.delete("/highlights/tags/motivation", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["affected"] == 1
+    assert client.get("/highlights", headers=auth_headers).json()["total"] == 2
+
+
+def test_delete_highlights_by_tag(auth_headers):
+    response = client.delete(
+        "/highlights/tags/motivation/highlights", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["affected"] == 1
+    assert client.get("/highlights", headers=auth_headers).json()["total"] == 1
+
+
+def test_get_tag_counts(auth_headers):
+    client.post(
+        "/highlights",
+        json={"text": "More", "source": "Book", "tags": ["career"]},
+        headers=auth_headers,
+    )
+
+    response = client.get("/highlights/tags", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["tags"]["career"] == 2
+    assert data["tags"]["einstein"] == 1
+    assert next(iter(data["tags"])) == "career"
+    assert data["total"] == 8
+
+
+def test_create_duplicate_highlight_modes(auth_headers):
+    duplicate = {
+        "text": "In the  middle of DIFFICULTY lies opportunity.",
+        "source": "albert einstein",
+        "tags": [],
+    }
+
+    response = client.post(
+        "/highlights?on_duplicate=reject", json=duplicate, headers=auth_headers
+    )
+    assert response.status_code == 409
+    assert response.json()["type"] == "/errors/duplicate-highlight"
+
+    response = client.post(
+        "/highlights?on_duplicate=return", json=duplicate, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["highlight"]["id"] == 2
+
+    response = client.post("/highlights", json=duplicate, headers=auth_headers)
+    assert response.status_code == 201
+    assert client.get("/highlights", headers=auth_headers).json()["total"] == 3
+
+
+def test_create_highlight_rejects_unknown_duplicate_mode(auth_headers):
+    highlight = {"text": "Text", "source": "Source", "tags": []}
+    response = client.post(
+        "/highlights?on_duplicate=merge", json=highlight, headers=auth_headers
+    )
+    assert response.status_code == 422
+
+
+def test_get_sources(auth_headers):
+    client.post(
+        "/highlights",
+        json={"text": "Imagination is more important", "source": "Albert Einstein"},
+        headers=auth_headers,
+    )
+
+    response = client.get("/highlights/sources", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert data["sources"][0]["source"] == "Albert Einstein"
+    assert data["sources"][0]["count"] == 2
+
+
+def test_filter_highlights_by_source(auth_headers):
+    response = client.get(
+        "/highlights", params={"source": "Albert Einstein"}, headers=auth_headers
+    )
+    assert response.json()["total"] == 1
+    assert response.json()["highlights"][0]["id"] == 2
+
+    response = client.get(
+        "/highlights",
+        params={"source": "Albert Einstein", "tag": "motivation", "limit": 10},
+        headers=auth_headers,
+    )
+    assert response.json()["total"] == 0
+    assert response.json()["highlights"] == []
+
+
+def test_filter_highlights_by_created_range(auth_headers):
+    response = client.get(
+        "/highlights", params={"created_from": "2024-01-16"}, headers=auth_headers
+    )
+    assert [h["id"] for h in response.json()["highlights"]] == [2]
+
+    response = client.get(
+        "/highlights",
+        params={"created_to": "2024-01-20T14:15:00", "limit": 5},
+        headers=auth_headers,
+    )
+    assert response.json()["total"] == 1
+    assert [h["id"] for h in response.json()["highlights"]] == [1]
+
+
+def test_export_markdown_with_created_range(auth_headers):
+    response = client.get(
+        "/highlights/export/markdown",
+        params={"created_from": "2024-01-01T00:00:00", "created_to": "2024-01-16"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["total_highlights"] == 1
+    assert "Stanford" in response.json()["content"]
+
+
+def test_filter_highlights_rejects_malformed_date(auth_headers):
+    response = client.get(
+        "/highlights", params={"created_from": "last month"}, headers=auth_headers
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"created_from": "0001-01-01T00:00:00+05:00"},
+        {"created_to": "9999-12-31T23:59:59-05:00"},
+    ],
+)
+def test_filter_highlights_rejects_unrepresentable_date(auth_headers, params):
+    response = client.get("/highlights", params=params, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["type"] == "/errors/invalid-date-range"
+
+
+def test_create_highlight_with_idempotency_key_is_replayed(auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "retry-1"}
+    highlight = {"text": "Retried", "source": "Phone", "tags": []}
+
+    first = client.post("/highlights", json=highlight, headers=headers)
+    second = client.post("/highlights", json=highlight, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert client.get("/highlights", headers=auth_headers).json()["total"] == 3
+
+
+def test_idempotent_replay_from_shared_sqlite_cache(
+    auth_headers, monkeypatch, tmp_path
+):
+    shared = SQLiteIdempotencyCache(str(tmp_path / "state.db"), max_entries=10, ttl=60)
+    monkeypatch.setattr(idempotency, "idempotency_cache", shared)
+    headers = {**auth_headers, "Idempotency-Key": "retry-shared"}
+    highlight = {"text": "Retried", "source": "Phone", "tags": ["x"]}
+
+    first = client.post("/highlights", json=highlight, headers=headers)
+    second = client.post("/highlights", json=highlight, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert client.get("/highlights", headers=auth_headers).json()["total"] == 3
+    shared.close()
+
+
+def test_idempotency_key_reused_with_other_body(auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "retry-2"}
+    client.post(
+        "/highlights", json={"text": "A", "source": "S", "tags": []}, headers=headers
+    )
+
+    response = client.post(
+        "/highlights", json={"text": "B", "source": "S", "tags": []}, headers=headers
+    )
+    assert response.status_code == 422
+    assert response.json()["type"] == "/errors/idempotency-key-reused"
+
+
+def test_failed_request_is_not_cached(auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "retry-3"}
+    duplicate = {
+        "text": "In the middle of difficulty lies opportunity.",
+        "source": "Albert Einstein",
+        "tags": [],
+    }
+
+    response = client.post(
+        "/highlights?on_duplicate=reject", json=duplicate, headers=headers
+    )
+    assert response.status_code == 409
+    storage.delete(2)
+
+    response = client.post(
+        "/highlights?on_duplicate=reject", json=duplicate, headers=headers
+    )
+    assert response.status_code == 201
+
+
+def test_create_highlights_batch_with_idempotency_key(auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "batch-1"}
+    items = [{"text": f"Import {n}", "source": "Kindle", "tags": []} for n in range(3)]
+
+    first = client.post("/highlights/batch", json={"items": items}, headers=headers)
+    second = client.post("/highlights/batch", json={"items": items}, headers=headers)
+
+    assert second.json()["created"] == first.json()["created"]
+    assert client.get("/highlights", headers=auth_headers).json()["total"] == 5
+
+
+@pytest.mark.parametrize("path", ["/highlights", "/highlights/export/markdown"])
+def test_conditional_get_returns_304_until_owner_writes(auth_headers, path):
+    first = client.get(path, headers=auth_headers)
+    etag = first.headers["ETag"]
+
+    cached = client.get(path, headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    candidates = f'"other", {etag.removeprefix("W/")}'
+    response = client.get(path, headers={**auth_headers, "If-None-Match": candidates})
+    assert response.status_code == 304
+
+    other = issue_access_token(sub="other-user", role="user")
+    client.post(
+        "/highlights",
+        json={"text": "Other", "source": "Book", "tags": []},
+        headers={"Authorization": f"Bearer {other}"},
+    )
+    response = client.get(path, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.put("/highlights/1", json={"text": "Changed"}, headers=auth_headers)
+    response = client.get(path, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_conditional_get_does_not_load_highlights(auth_headers, monkeypatch):
+    etag = client.get("/highlights", headers=auth_headers).headers["ETag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("highlights were loaded")
+
+    for name in ("get_all", "get_by_tag", "get_page", "count"):
+        monkeypatch.setattr(async_storage, name, fail)
+    for path in ("/highlights?limit=1", "/highlights?tag=motivation"):
+        response = client.get(path, headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+
+def test_etag_differs_between_owners(auth_headers):
+    other = issue_access_token(sub="other-user", role="user")
+    mine = client.get("/highlights", headers=auth_headers).headers["ETag"]
+    theirs = client.get(
+        "/highlights", headers={"Authorization": f"Bearer {other}"}
+    ).headers["ETag"]
+    assert mine != theirs
+
+
+def test_fields_project_list_and_get(auth_headers):
+    response = client.get("/highlights?fields=id,source,tags", headers=auth_headers)
+    assert response.status_code == 200
+    highlights = response.json()["highlights"]
+    assert highlights and all(set(h) == {"id", "source", "tags"} for h in highlights)
+
+    response = client.get("/highlights/1?fields=text", headers=auth_headers)
+    assert response.json()["highlight"] == {
+        "text": client.get("/highlights/1", headers=auth_headers).json()["highlight"][
+            "text"
+        ]
+    }
+
+
+def test_fields_keep_pagination_working(auth_headers):
+    first = client.get("/highlights?limit=1&fields=source", headers=auth_headers)
+    data = first.json()
+    assert data["highlights"] == [{"source": "Albert Einstein"}]
+    assert data["next_cursor"]
+
+    second = client.get(
+        f"/highlights?limit=1&fields=source&cursor={data['next_cursor']}",
+        headers=auth_headers,
+    )
+    assert second.json()["highlights"][0]["source"].startswith("Steve Jobs")
+
+
+@pytest.mark.parametrize("fields", ["id,password", "", "id,,tags"])
+def test_unknown_fields_are_rejected(auth_headers, fields):
+    response = client.get(f"/highlights?fields={fields}", headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["type"] == "/errors/invalid-fields"
+
+
+def test_stream_returns_ndjson_in_created_order(auth_headers, monkeypatch):
+    monkeypatch.setattr("app.main.STREAM_BATCH_SIZE", 2)
+    limits = []
+    get_page = async_storage.get_page
+
+    async def recording_get_page(owner_id, limit, **kwargs):
+        limits.append(limit)
+        return await get_page(owner_id, limit, **kwargs)
+
+    monkeypatch.setattr(async_storage, "get_page", recording_get_page)
+    client.post(
+        "/highlights/batch",
+        json={"items": [{"text": f"Line {n}", "source": "Book"} for n in range(3)]},
+        headers=auth_headers,
+    )
+
+    response = client.get("/highlights/stream", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+    listed = client.get("/highlights", headers=auth_headers).json()["highlights"]
+    assert streamed == listed[::-1]
+    assert [h["id"] for h in streamed] == [1, 2, 3, 4, 5]
+    assert set(limits) == {2}
+
+
+def test_stream_applies_filters_and_fields(auth_headers):
+    response = client.get(
+        "/highlights/stream?tag=einstein&fields=id,source", headers=auth_headers
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"id": 2, "source": "Albert Einstein"}]
+
+    other = issue_access_token(sub="nobody", role="user")
+    empty = client.get(
+        "/highlights/stream", headers={"Authorization": f"Bearer {other}"}
+    )
+    assert empty.status_code == 200
+    assert empty.content == b""
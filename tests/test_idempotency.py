@@ -0,0 +1,118 @@
+import pytest
+
+from app.idempotency import IdempotencyCache, IdempotencyError
+from app.shared_state import SQLiteIdempotencyCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_completed_request_is_replayed():
+    cache = IdempotencyCache()
+
+    assert cache.begin("alice", "k1", "hash") is None
+    cache.complete("alice", "k1", 201, {"id": 7})
+
+    replay = cache.begin("alice", "k1", "hash")
+    assert (replay.status_code, replay.body) == (201, {"id": 7})
+    assert cache.begin("bob", "k1", "hash") is None
+
+
+def test_key_reused_with_other_request_is_rejected():
+    cache = IdempotencyCache()
+    cache.begin("alice", "k1", "hash")
+    cache.complete("alice", "k1", 201, {})
+
+    with pytest.raises(IdempotencyError) as exc_info:
+        cache.begin("alice", "k1", "other")
+    assert exc_info.value.status == 422
+
+
+def test_request_in_progress_is_refused_and_abandon_frees_key():
+    cache = IdempotencyCache()
+    cache.begin("alice", "k1", "hash")
+
+    with pytest.raises(IdempotencyError) as exc_info:
+        cache.begin("alice", "k1", "hash")
+    assert exc_info.value.code == "request_in_progress"
+
+    cache.abandon("alice", "k1")
+    assert cache.begin("alice", "k1", "hash") is None
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = IdempotencyCache(ttl=60, clock=clock)
+    cache.begin("alice", "k1", "hash")
+    cache.complete("alice", "k1", 201, {})
+
+    clock.now = 60
+    assert cache.begin("alice", "k1", "other") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IdempotencyCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.begin("alice", key, "hash")
+        cache.complete("alice", key, 201, key)
+
+    cache.begin("alice", "a", "hash")
+    cache.begin("alice", "c", "hash")
+
+    assert len(cache) == 2
+    assert cache.begin("alice", "a", "hash").body == "a"
+    assert cache.begin("alice", "b", "hash") is None
+
+
+def test_idempotency_keys_are_shared_between_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = SQLiteIdempotencyCache(path, max_entries=10, ttl=60)
+    second = SQLiteIdempotencyCache(path, max_entries=10, ttl=60)
+
+    assert first.begin("alice", "k1", "hash") is None
+    with pytest.raises(IdempotencyError) as exc_info:
+        second.begin("alice", "k1", "hash")
+    assert exc_info.value.code == "request_in_progress"
+
+    first.complete("alice", "k1", 201, {"highlight": {"id": 7}})
+    replay = second.begin("alice", "k1", "hash")
+    assert (replay.status_code, replay.body) == (201, {"highlight": {"id": 7}})
+    with pytest.raises(IdempotencyError) as exc_info:
+        second.begin("alice", "k1", "other")
+    assert exc_info.value.status == 422
+    assert second.begin("bob", "k1", "hash") is None
+    first.close()
+    second.close()
+
+
+def test_idempotency_reservations_expire_and_rows_are_capped(tmp_path):
+    now = [0.0]
+    cache = SQLiteIdempotencyCache(
+        str(tmp_path / "state.db"),
+        max_entries=2,
+        ttl=600,
+        lease=60,
+        clock=lambda: now[0],
+    )
+    cache.begin("alice", "abandoned", "hash")
+    now[0] = 60
+    assert cache.begin("alice", "abandoned", "hash") is None
+
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.begin("alice", key, "hash")
+        cache.complete("alice", key, 201, key)
+    now[0] += 1
+    cache.begin("alice", "a", "hash")
+    now[0] += 1
+    cache.begin("alice", "c", "hash")
+
+    assert len(cache) == 2
+    assert cache.begin("alice", "a", "hash").body == "a"
+    assert cache.begin("alice", "b", "hash") is None
+    cache.close()
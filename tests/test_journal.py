@@ -0,0 +1,167 @@
+import threading
+
+from app import storage as storage_module
+from app.journal import Journal
+from app.storage import HighlightStorage
+
+
+def open_storage(path, **kwargs):
+    kwargs.setdefault("fsync_interval", 0)
+    return HighlightStorage(journal=Journal(str(path), **kwargs))
+
+
+def test_fresh_journal_starts_from_defaults(tmp_path):
+    store = open_storage(tmp_path)
+
+    assert [h["id"] for h in store.get_all(owner_id="demo-user")] == [1, 2]
+    assert (tmp_path / "snapshot.json").exists()
+    store.close()
+
+
+def test_recovery_replays_journal_tail(tmp_path):
+    store = open_storage(tmp_path)
+    kept = store.create("Kept", "Source", ["keep"], owner_id="alice")
+    gone = store.create("Gone", "Source", [], owner_id="alice")
+    kept = store.update(kept["id"], {"tags": ["renamed"]}, owner_id="alice")
+    store.delete(gone["id"], owner_id="alice")
+    store.close()
+
+    recovered = open_storage(tmp_path)
+
+    assert recovered.get_all(owner_id="alice") == [kept]
+    assert [h["id"] for h in recovered.get_by_tag("renamed", owner_id="alice")] == [
+        kept["id"]
+    ]
+    assert recovered.create("Next", "Source", [], owner_id="alice")["id"] == 5
+    recovered.close()
+
+
+def test_snapshot_compacts_segments(tmp_path):
+    store = open_storage(tmp_path, snapshot_every=3)
+    for n in range(7):
+        store.create(f"Text {n}", "Source", [], owner_id="alice")
+    store.close()
+
+    assert len(list(tmp_path.glob("journal-*.log"))) <= 2
+
+    recovered = open_storage(tmp_path, snapshot_every=3)
+    assert len(recovered.get_all(owner_id="alice")) == 7
+    recovered.close()
+
+
+def test_snapshot_dicts_are_built_off_the_writer(tmp_path, monkeypatch):
+    store = open_storage(tmp_path, snapshot_every=3)
+    threads = set()
+    to_dict = storage_module._record_to_dict
+
+    def tracking_to_dict(record, tag_names):
+        threads.add(threading.current_thread().name)
+        return to_dict(record, tag_names)
+
+    monkeypatch.setattr(storage_module, "_record_to_dict", tracking_to_dict)
+    first = [
+        store.create(f"Text {n}", "Source", [], owner_id="alice") for n in range(3)
+    ]
+    store.update(first[0]["id"], {"text": "After snapshot"}, owner_id="alice")
+    store.close()
+
+    assert "journal-snapshot" in threads
+    recovered = open_storage(tmp_path, snapshot_every=3)
+    assert recovered.get_by_id(first[0]["id"])["text"] == "After snapshot"
+    assert len(recovered.get_all(owner_id="alice")) == 3
+    recovered.close()
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    store = open_storage(tmp_path)
+    store.create("Durable", "Source", [], owner_id="alice")
+    store.close()
+    segment = sorted(tmp_path.glob("journal-*.log"))[-1]
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write('{"seq": 99, "op": "delete", "id"')
+
+    recovered = open_storage(tmp_path)
+
+    assert [h["text"] for h in recovered.get_all(owner_id="alice")] == ["Durable"]
+    recovered.close()
+
+
+def test_torn_tail_is_cut_before_new_appends(tmp_path):
+    store = open_storage(tmp_path)
+    first = store.create("First", "Source", [], owner_id="alice")
+    store.close()
+    open_storage(tmp_path).close()
+    segment = sorted(tmp_path.glob("journal-*.log"))[-1]
+    assert segment.read_text() == ""
+    segment.write_text('{"seq": 2, "op": "cre')
+
+    recovered = open_storage(tmp_path)
+    second = recovered.create("Second", "Source", [], owner_id="alice")
+    recovered.close()
+
+    reopened = open_storage(tmp_path)
+    assert reopened.get_all(owner_id="alice") == [first, second]
+    reopened.close()
+
+
+def test_undecodable_last_line_is_treated_as_torn(tmp_path):
+    store = open_storage(tmp_path)
+    store.create("Durable", "Source", [], owner_id="alice")
+    store.close()
+    segment = sorted(tmp_path.glob("journal-*.log"))[-1]
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write('{"seq": 99, "op\n')
+
+    recovered = open_storage(tmp_path)
+    recovered.create("Next", "Source", [], owner_id="alice")
+    recovered.close()
+
+    reopened = open_storage(tmp_path)
+    assert [h["text"] for h in reopened.get_all(owner_id="alice")] == [
+        "Durable",
+        "Next",
+    ]
+    reopened.close()
+
+
+def test_group_commit_defers_writes_until_flush(tmp_path):
+    journal = Journal(str(tmp_path), fsync_interval=60)
+    journal.load()
+    journal.append("delete", id=1)
+    segment = sorted(tmp_path.glob("journal-*.log"))[-1]
+
+    assert segment.read_text() == ""
+
+    journal.flush()
+    assert '"op": "delete"' in segment.read_text()
+    journal.close()
+
+
+def test_batch_is_replayed_as_one_record(tmp_path):
+    store = open_storage(tmp_path)
+    created = store.create_many(
+        [{"text": f"Batch {n}", "source": "Importer", "tags": []} for n in range(3)],
+        owner_id="alice",
+    )
+    store.close()
+
+    recovered = open_storage(tmp_path)
+
+    assert recovered.get_all(owner_id="alice") == created
+    recovered.close()
+
+
+def test_bulk_tag_operations_are_replayed(tmp_path):
+    store = open_storage(tmp_path)
+    renamed = store.create("Renamed", "Source", ["old"], owner_id="alice")
+    store.create("Purged", "Source", ["purge"], owner_id="alice")
+    store.rename_tag("alice", "old", "new")
+    store.delete_by_tag("alice", "purge")
+    renamed = store.get_by_id(renamed["id"])
+    store.close()
+
+    recovered = open_storage(tmp_path)
+
+    assert recovered.get_all(owner_id="alice") == [renamed]
+    assert recovered.count("alice", tag="new") == 1
+    recovered.close()
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from app.locks import RWLock
+
+
+def test_readers_share_the_lock():
+    lock = RWLock()
+    inside = threading.Barrier(2, timeout=2)
+
+    def reader():
+        with lock.read():
+            inside.wait()
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not inside.broken
+
+
+def test_writer_excludes_readers():
+    lock = RWLock()
+    events = []
+
+    def writer():
+        with lock.write():
+            events.append("write-start")
+            time.sleep(0.05)
+            events.append("write-end")
+
+    def reader():
+        with lock.read():
+            events.append("read")
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    time.sleep(0.01)
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    writer_thread.join()
+    reader_thread.join()
+
+    assert events == ["write-start", "write-end", "read"]
@@ -0,0 +1,107 @@
+"""Several uvicorn workers on one SQLite file serve one dataset."""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+WORKERS = 3
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server(tmp_path):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'highlights.db'}",
+        "SECRET_KEY": "multiworker-secret",
+        "ENVIRONMENT": "development",
+    }
+    env.pop("JOURNAL_DIR", None)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(WORKERS),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                break
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline or process.poll() is not None:
+            process.kill()
+            pytest.fail("uvicorn workers did not start")
+        time.sleep(0.2)
+    yield base_url
+    process.terminate()
+    process.wait(timeout=30)
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_workers_share_highlights_limits_idempotency_and_revocations(server):
+    # Every call opens a new connection, so requests spread over the workers.
+    tokens = httpx.post(
+        f"{server}/auth/login", json={"username": "demo", "password": "demo123"}
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    retried = {"text": "Retried", "source": "Phone", "tags": []}
+    replies = [
+        httpx.post(
+            f"{server}/highlights",
+            json=retried,
+            headers={**headers, "Idempotency-Key": "mobile-retry"},
+        )
+        for _ in range(2 * WORKERS)
+    ]
+    assert len({reply.json()["highlight"]["id"] for reply in replies}) == 1
+
+    for n in range(9):
+        response = httpx.post(
+            f"{server}/highlights",
+            json={"text": f"Quote {n}", "source": "Book", "tags": []},
+            headers=headers,
+        )
+        assert response.status_code == 201
+    response = httpx.post(
+        f"{server}/highlights",
+        json={"text": "One too many", "source": "Book", "tags": []},
+        headers=headers,
+    )
+    assert response.status_code == 429
+
+    for _ in range(2 * WORKERS):
+        listing = httpx.get(f"{server}/highlights", headers=headers).json()
+        assert listing["total"] == 12
+
+    refresh = {"refresh_token": tokens["refresh_token"]}
+    assert httpx.post(f"{server}/auth/token", json=refresh).status_code == 200
+    for _ in range(2 * WORKERS):
+        assert httpx.post(f"{server}/auth/token", json=refresh).status_code == 401
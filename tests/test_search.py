@@ -0,0 +1,54 @@
+from app.search import SearchIndex, tokenize
+
+
+def test_tokenize_lowercases_and_splits_on_punctuation():
+    assert tokenize("Don't settle, Steve-Jobs!") == [
+        "don",
+        "t",
+        "settle",
+        "steve",
+        "jobs",
+    ]
+
+
+def test_search_ranks_by_bm25():
+    index = SearchIndex()
+    index.add("alice", 1, "great work great love")
+    index.add("alice", 2, "great difficulty")
+    index.add("alice", 3, "opportunity")
+
+    hits = index.search("alice", "great love")
+
+    assert [doc_id for doc_id, _ in hits] == [1, 2]
+    assert hits[0][1] > hits[1][1]
+
+
+def test_search_is_owner_scoped():
+    index = SearchIndex()
+    index.add("alice", 1, "shared words")
+    index.add("bob", 2, "shared words")
+
+    assert [doc_id for doc_id, _ in index.search("bob", "shared")] == [2]
+    assert index.search("carol", "shared") == []
+
+
+def test_partial_search_uses_trigrams():
+    index = SearchIndex()
+    index.add("alice", 1, "opportunity knocks")
+
+    assert index.search("alice", "portun") == []
+    assert [doc_id for doc_id, _ in index.search("alice", "portun", partial=True)] == [
+        1
+    ]
+
+
+def test_remove_drops_postings_and_vocabulary():
+    index = SearchIndex()
+    index.add("alice", 1, "opportunity")
+    index.add("alice", 2, "other")
+
+    index.remove("alice", 1, "opportunity")
+
+    assert index.search("alice", "opportunity") == []
+    assert index.search("alice", "port", partial=True) == []
+    assert [doc_id for doc_id, _ in index.search("alice", "other")] == [2]
@@ -0,0 +1,98 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app import serialization
+from app import storage as storage_module
+from app.models import Highlight, HighlightListResponse
+from app.serialization import CacheStats, highlight_list_response, highlight_response
+from app.storage import HighlightStorage
+
+HIGHLIGHTS = [
+    {
+        "id": 1,
+        "text": 'Quote with "quotes", émoji 📚 and \\n escapes',
+        "source": "Book",
+        "tags": ["a", "b"],
+        "owner_id": "alice",
+        "created_at": datetime(2024, 1, 15, 10, 30, 0),
+        "updated_at": datetime(2024, 1, 15, 10, 30, 0, 123456),
+    }
+]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_path_matches_response_model(monkeypatch, use_orjson):
+    if use_orjson and not serialization.ORJSON_AVAILABLE:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(serialization, "ORJSON_AVAILABLE", use_orjson)
+
+    response = highlight_list_response(
+        HIGHLIGHTS, total=5, next_cursor="abc", message="ok"
+    )
+    expected = HighlightListResponse(
+        highlights=[Highlight(**h) for h in HIGHLIGHTS],
+        total=5,
+        next_cursor="abc",
+        message="ok",
+    ).model_dump_json()
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == json.loads(expected)
+
+
+def test_cached_fragments_match_response_model():
+    store = HighlightStorage()
+    store.create_many(
+        [{"text": 'Ünïcode "quoted"', "source": "Book", "tags": ["a"]}] * 3,
+        owner_id="alice",
+    )
+    highlights = store.get_all(owner_id="alice")
+    expected = HighlightListResponse(
+        highlights=[Highlight(**h) for h in highlights], total=3, message="ok"
+    ).model_dump_json()
+
+    for _ in range(2):
+        response = highlight_list_response(store.get_all(owner_id="alice"), 3, "ok")
+        assert json.loads(response.body) == json.loads(expected)
+
+    single = highlight_response(store.get_by_id(highlights[0]["id"]), "ok")
+    assert json.loads(single.body) == {
+        "highlight": json.loads(Highlight(**highlights[0]).model_dump_json()),
+        "message": "ok",
+    }
+
+
+def test_cached_list_is_joined_without_building_dicts(monkeypatch):
+    store = HighlightStorage()
+    store.create_many(
+        [{"text": f"Item {n}", "source": "Book", "tags": ["a"]} for n in range(3)],
+        owner_id="alice",
+    )
+    first = highlight_list_response(store.get_all(owner_id="alice"), 3, "ok")
+    built = []
+    to_dict = storage_module._record_to_dict
+
+    def tracking_to_dict(record, tag_names):
+        built.append(record.id)
+        return to_dict(record, tag_names)
+
+    monkeypatch.setattr(storage_module, "_record_to_dict", tracking_to_dict)
+    second = highlight_list_response(store.get_all(owner_id="alice"), 3, "ok")
+
+    assert second.body == first.body
+    assert built == []
+
+
+def test_cache_stats_report_hit_ratio_and_saved_time():
+    stats = CacheStats()
+    stats.miss(0.002)
+    stats.miss(0.004)
+    for _ in range(6):
+        stats.hit()
+
+    snapshot = stats.snapshot()
+    assert snapshot["hit_ratio"] == 0.75
+    assert snapshot["cpu_seconds_saved"] == pytest.approx(0.018)
+    assert CacheStats().snapshot()["hit_ratio"] == 0.0
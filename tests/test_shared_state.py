@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+import pytest
+
+from app.shared_state import SQLiteDenylist, SQLiteRateLimiter, shared_path
+
+
+def test_shared_path_only_for_sqlite_files():
+    assert shared_path("sqlite:////var/lib/highlights.db") == "/var/lib/highlights.db"
+    assert shared_path("sqlite:///:memory:") is None
+    assert shared_path(None) is None
+    assert shared_path("postgresql://db/highlights") is None
+
+
+@pytest.mark.parametrize(
+    "url", ["sqlite://data.db", "sqlite:data.db", "sqlite://", "sqlite:///"]
+)
+def test_shared_path_rejects_malformed_sqlite_urls(url):
+    with pytest.raises(ValueError):
+        shared_path(url)
+
+
+def test_rate_limit_counters_are_shared_between_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    first, second = SQLiteRateLimiter(path), SQLiteRateLimiter(path)
+    window = timedelta(minutes=1)
+
+    assert first.check_limit("ip", "/highlights", 3, window, cost=2)
+    assert second.check_limit("ip", "/highlights", 3, window)
+    assert not first.check_limit("ip", "/highlights", 3, window)
+    assert second.check_limit("ip", "/other", 3, window)
+
+    first.reset()
+    assert second.check_limit("ip", "/highlights", 3, window, cost=3)
+    first.close()
+    second.close()
+
+
+def test_rate_limit_window_expires(tmp_path):
+    limiter = SQLiteRateLimiter(str(tmp_path / "state.db"))
+
+    assert limiter.check_limit("ip", "/x", 1, timedelta(0))
+    assert limiter.check_limit("ip", "/x", 1, timedelta(0))
+    limiter.close()
+
+
+def test_denylist_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = SQLiteDenylist(path, ttl=timedelta(days=7))
+    second = SQLiteDenylist(path, ttl=timedelta(days=7))
+
+    first.add("jti-1")
+
+    assert "jti-1" in second
+    assert "jti-2" not in second
+    second.clear()
+    assert "jti-1" not in first
+    first.close()
+    second.close()
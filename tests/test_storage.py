@@ -0,0 +1,519 @@
+"""Unit tests for the storage engines and their secondary indexes."""
+
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from app.models import Highlight
+from app.sqlite_storage import SQLiteHighlightStorage
+from app.storage import HighlightStorage, _View, create_storage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request):
+    if request.param == "memory":
+        yield HighlightStorage()
+        return
+    engine = SQLiteHighlightStorage(":memory:")
+    yield engine
+    engine.close()
+
+
+def test_get_all_is_scoped_to_owner(store):
+    store.create("a", "src", [], owner_id="alice")
+    store.create("b", "src", [], owner_id="bob")
+
+    alice = store.get_all(owner_id="alice")
+
+    assert [h["text"] for h in alice] == ["a"]
+    assert {h["owner_id"] for h in store.get_all(owner_id="demo-user")} == {"demo-user"}
+
+
+def test_owner_index_follows_delete(store):
+    created = store.create("a", "src", [], owner_id="alice")
+
+    store.delete(created["id"], owner_id="alice")
+
+    assert store.get_all(owner_id="alice") == []
+    assert store.count("alice") == 0
+
+
+def test_delete_by_other_owner_keeps_index(store):
+    created = store.create("a", "src", [], owner_id="alice")
+
+    assert store.delete(created["id"], owner_id="bob") is None
+    assert store.get_all(owner_id="alice") == [created]
+
+
+def test_reset_rebuilds_owner_index(store):
+    store.create("a", "src", [], owner_id="alice")
+
+    store.reset_to_default()
+
+    assert store.get_all(owner_id="alice") == []
+    assert len(store.get_all(owner_id="demo-user")) == 2
+
+
+def test_get_by_tag_uses_owner_tag_index(store):
+    store.create("a", "src", ["shared"], owner_id="alice")
+    store.create("b", "src", ["shared"], owner_id="bob")
+
+    assert [h["text"] for h in store.get_by_tag("SHARED", owner_id="alice")] == ["a"]
+    assert len(store.get_by_tag("shared")) == 2
+    assert store.count("alice", tag="shared") == 1
+
+
+def test_tag_index_follows_tag_replacement(store):
+    store.update(1, {"tags": ["renamed"]}, owner_id="demo-user")
+
+    assert store.get_by_tag("motivation", owner_id="demo-user") == []
+    assert [h["id"] for h in store.get_by_tag("renamed", owner_id="demo-user")] == [1]
+    assert store.count("demo-user", tag="motivation") == 0
+
+
+def test_tag_index_follows_delete(store):
+    store.delete(2, owner_id="demo-user")
+
+    assert store.get_by_tag("einstein", owner_id="demo-user") == []
+    assert store.count("demo-user", tag="einstein") == 0
+
+
+def test_owner_reads_are_ordered_by_created_at(store):
+    store.update(1, {"text": "still oldest"}, owner_id="demo-user")
+    created = store.create("newest", "src", ["career"], owner_id="demo-user")
+
+    oldest_first = [h["id"] for h in store.get_all(owner_id="demo-user")]
+    newest_first = [
+        h["id"] for h in store.get_all(owner_id="demo-user", newest_first=True)
+    ]
+
+    assert oldest_first == [1, 2, created["id"]]
+    assert newest_first == [created["id"], 2, 1]
+    assert [
+        h["id"] for h in store.get_by_tag("career", "demo-user", newest_first=True)
+    ] == [created["id"], 1]
+
+
+def test_get_page_resumes_after_key(store):
+    first, has_more = store.get_page("demo-user", limit=1)
+    assert [h["id"] for h in first] == [2]
+    assert has_more
+
+    after = (first[-1]["created_at"], first[-1]["id"])
+    second, has_more = store.get_page("demo-user", limit=1, after=after)
+    assert [h["id"] for h in second] == [1]
+    assert not has_more
+
+
+def test_search_follows_update_and_delete(store):
+    created = store.create("Quiet wisdom", "Lao Tzu", [], owner_id="demo-user")
+    assert [h["id"] for h in store.search("wisdom", owner_id="demo-user")] == [
+        created["id"]
+    ]
+
+    store.update(created["id"], {"text": "Loud noise"}, owner_id="demo-user")
+    assert store.search("wisdom", owner_id="demo-user") == []
+    assert [h["id"] for h in store.search("lao", owner_id="demo-user")] == [
+        created["id"]
+    ]
+
+    store.delete(created["id"], owner_id="demo-user")
+    assert store.search("noise", owner_id="demo-user") == []
+
+
+def test_sqlite_engine_persists_across_connections(tmp_path):
+    url = f"sqlite:///{tmp_path / 'highlights.db'}"
+    first = create_storage(url)
+    created = first.create("Kept", "Disk", ["durable"], owner_id="alice")
+    first.close()
+
+    second = create_storage(url)
+
+    assert second.get_by_id(created["id"]) == created
+    assert [h["id"] for h in second.get_by_tag("durable", owner_id="alice")] == [
+        created["id"]
+    ]
+    assert second._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    second.close()
+
+
+def test_create_storage_rejects_unknown_scheme():
+    with pytest.raises(ValueError):
+        create_storage("postgresql://localhost/testdb")
+
+
+@pytest.mark.parametrize("url", ["sqlite://data.db", "sqlite:data.db", "sqlite://"])
+def test_create_storage_rejects_malformed_sqlite_url(url):
+    with pytest.raises(ValueError):
+        create_storage(url)
+
+
+def test_reads_return_copies(store):
+    highlight = store.get_by_id(1)
+    highlight["tags"].append("mutated")
+    highlight["text"] = "mutated"
+
+    assert store.get_by_id(1)["text"] != "mutated"
+    assert "mutated" not in store.get_by_id(1)["tags"]
+
+
+def test_memory_records_share_interned_tags():
+    store = HighlightStorage()
+    first = store.create("a", "src", ["shared"], owner_id="alice")
+    second = store.create("b", "src", ["shared"], owner_id="bob")
+
+    first_record = store._highlights[first["id"]]
+    second_record = store._highlights[second["id"]]
+
+    assert first_record.tag_ids == second_record.tag_ids
+    assert isinstance(first_record.created_at, int)
+    assert not hasattr(first_record, "__dict__")
+
+
+def test_memory_view_is_a_point_in_time_snapshot():
+    store = HighlightStorage()
+    created = store.create("before", "src", ["old"], owner_id="alice")
+    with store._lock.read():
+        view = store._view(store._by_owner["alice"].ids())
+
+    store.update(created["id"], {"text": "after", "tags": ["new"]}, owner_id="alice")
+    store.reset_to_default()
+
+    assert view.to_dicts() == [created]
+
+
+def test_memory_list_reads_do_not_block_writers(monkeypatch):
+    store = HighlightStorage()
+    store.create("a", "src", [], owner_id="alice")
+    building, release = threading.Event(), threading.Event()
+    to_dicts = _View.to_dicts
+
+    def slow_to_dicts(view, fields=None):
+        building.set()
+        release.wait(5)
+        return to_dicts(view, fields)
+
+    monkeypatch.setattr(_View, "to_dicts", slow_to_dicts)
+    results = []
+    reader = threading.Thread(
+        target=lambda: results.append(store.get_all(owner_id="alice"))
+    )
+    reader.start()
+    assert building.wait(5)
+
+    store.create("b", "src", [], owner_id="alice")
+    release.set()
+    reader.join()
+
+    assert [h["text"] for h in results[0]] == ["a"]
+
+
+def test_concurrent_create_update_list(store):
+    threads_count, per_thread = 8, 60
+    created_ids = []
+    errors = []
+    start = threading.Barrier(threads_count)
+
+    def hammer(worker: int):
+        try:
+            start.wait()
+            for n in range(per_thread):
+                created = store.create(f"t{worker}-{n}", "src", ["load"], "alice")
+                created_ids.append(created["id"])
+                store.update(created["id"], {"tags": ["load", f"w{worker}"]}, "alice")
+                store.get_all(owner_id="alice", newest_first=True)
+                store.get_by_tag("load", owner_id="alice")
+        except Exception as exc:  # pragma: no cover - surfaced by the assert
+            errors.append(exc)
+
+    threads = [threading.Thread(target=hammer, args=(w,)) for w in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = threads_count * per_thread
+    assert errors == []
+    assert len(set(created_ids)) == total
+    assert store.count("alice") == total
+    assert store.count("alice", tag="load") == total
+    assert len(store.get_all(owner_id="alice")) == total
+
+
+def test_create_many_indexes_every_item(store):
+    created = store.create_many(
+        [
+            {"text": "one", "source": "src", "tags": ["bulk"]},
+            {"text": "two", "source": "src", "tags": ["bulk", "extra"]},
+        ],
+        owner_id="alice",
+    )
+
+    assert [h["text"] for h in created] == ["one", "two"]
+    assert len({h["id"] for h in created}) == 2
+    assert store.count("alice", tag="bulk") == 2
+    assert [h["id"] for h in store.get_all(owner_id="alice")] == [
+        h["id"] for h in created
+    ]
+
+
+def test_rename_tag_merges_into_existing_tag(store):
+    both = store.create("both", "src", ["old", "new"], owner_id="alice")
+    only_old = store.create("old", "src", ["x", "old"], owner_id="alice")
+    other = store.create("bob", "src", ["old"], owner_id="bob")
+
+    assert store.rename_tag("alice", "OLD", "new") == 2
+
+    assert store.get_by_id(both["id"])["tags"] == ["new"]
+    assert store.get_by_id(only_old["id"])["tags"] == ["x", "new"]
+    assert store.count("alice", tag="old") == 0
+    assert [h["id"] for h in store.get_by_tag("new", owner_id="alice")] == [
+        both["id"],
+        only_old["id"],
+    ]
+    assert store.get_by_id(other["id"])["tags"] == ["old"]
+
+
+def test_tag_operations_handle_a_tag_listed_twice(store):
+    twice = store.create("twice", "src", ["a", "x", "a"], owner_id="alice")
+
+    assert store.rename_tag("alice", "a", "b") == 1
+    assert store.get_by_id(twice["id"])["tags"] == ["b", "x"]
+    assert store.tag_counts("alice") == {"b": 1, "x": 1}
+    assert [h["id"] for h in store.get_by_tag("b", owner_id="alice")] == [twice["id"]]
+
+    store.delete(twice["id"])
+    assert store.get_by_tag("b", owner_id="alice") == []
+    assert store.count("alice", tag="b") == 0
+
+    again = store.create("again", "src", ["c", "c"], owner_id="alice")
+    assert store.delete_by_tag("alice", "c") == 1
+    assert store.get_by_id(again["id"]) is None
+
+
+def test_remove_tag_keeps_highlights(store):
+    created = store.create("a", "src", ["drop", "keep"], owner_id="alice")
+
+    assert store.remove_tag("alice", "drop") == 1
+    assert store.remove_tag("alice", "drop") == 0
+
+    assert store.get_by_id(created["id"])["tags"] == ["keep"]
+    assert store.count("alice") == 1
+    assert store.count("alice", tag="drop") == 0
+
+
+def test_delete_by_tag_removes_from_every_index(store):
+    store.create("gone one", "src", ["purge"], owner_id="alice")
+    store.create("gone two", "src", ["purge", "other"], owner_id="alice")
+    kept = store.create("kept", "src", ["other"], owner_id="alice")
+    store.create("bob gone", "src", ["purge"], owner_id="bob")
+
+    assert store.delete_by_tag("alice", "purge") == 2
+
+    assert store.get_all(owner_id="alice") == [kept]
+    assert store.count("alice", tag="other") == 1
+    assert store.search("gone", owner_id="alice") == []
+    assert store.count("bob", tag="purge") == 1
+
+
+def test_tag_counts_follow_writes(store):
+    first = store.create("a", "src", ["x", "y"], owner_id="alice")
+    store.create("b", "src", ["x"], owner_id="alice")
+    store.create("c", "src", ["x"], owner_id="bob")
+
+    assert store.tag_counts("alice") == {"x": 2, "y": 1}
+
+    store.update(first["id"], {"tags": ["z"]}, owner_id="alice")
+    assert store.tag_counts("alice") == {"x": 1, "z": 1}
+
+    store.delete(first["id"], owner_id="alice")
+    assert store.tag_counts("alice") == {"x": 1}
+    assert store.tag_counts("nobody") == {}
+
+
+def test_create_unique_matches_normalized_text_and_source(store):
+    first, created = store.create_unique("To be,  or not", "Hamlet", [], "alice")
+    assert created
+
+    again, created = store.create_unique(" to BE, or not ", "hamlet", ["x"], "alice")
+    assert not created
+    assert again == first
+    assert store.count("alice") == 1
+    assert store.create_unique("To be, or not", "Hamlet", [], "bob")[1]
+
+
+def test_content_index_follows_update_and_delete(store):
+    first = store.create("same", "src", [], owner_id="alice")
+    second = store.create("same", "src", [], owner_id="alice")
+
+    store.delete(first["id"], owner_id="alice")
+    assert store.create_unique("same", "src", [], "alice") == (second, False)
+
+    store.update(second["id"], {"text": "changed"}, owner_id="alice")
+    assert store.create_unique("same", "src", [], "alice")[1]
+    assert not store.create_unique("changed", "src", [], "alice")[1]
+
+
+def test_memory_records_share_identical_sources():
+    store = HighlightStorage()
+    source = "".join(["Meditations, ", "Marcus Aurelius"])
+    first = store.create("a", source, [], owner_id="alice")
+    second = store.create("b", "Meditations, Marcus Aurelius", [], owner_id="bob")
+
+    assert (
+        store._highlights[first["id"]].source is store._highlights[second["id"]].source
+    )
+
+
+def test_memory_json_cache_is_reused_until_update():
+    store = HighlightStorage()
+    created = store.create("before", "src", ["tag"], owner_id="alice")
+    first = store.get_by_id(created["id"]).json()
+
+    assert store.get_all(owner_id="alice")[0].json() is first
+    assert json.loads(first) == json.loads(Highlight(**created).model_dump_json())
+
+    store.update(created["id"], {"text": "after"}, owner_id="alice")
+    assert json.loads(store.get_by_id(created["id"]).json())["text"] == "after"
+
+
+def test_sqlite_engine_backfills_content_hash(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE highlights (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "text TEXT NOT NULL, source TEXT NOT NULL, tags TEXT NOT NULL, "
+        "owner_id TEXT NOT NULL, created_at INTEGER NOT NULL, "
+        "updated_at INTEGER NOT NULL);"
+        "INSERT INTO highlights (text, source, tags, owner_id, created_at, updated_at)"
+        " VALUES ('Old', 'Book', '[]', 'alice', 0, 0);"
+    )
+    conn.commit()
+    conn.close()
+
+    engine = SQLiteHighlightStorage(path)
+
+    existing, created = engine.create_unique("old", "book", [], "alice")
+    assert not created
+    assert existing["text"] == "Old"
+    engine.close()
+
+
+def test_source_index_follows_writes(store):
+    first = store.create("a", "Dune", [], owner_id="alice")
+    second = store.create("b", "Dune", [], owner_id="alice")
+    store.create("c", "Emma", [], owner_id="alice")
+    store.create("d", "Dune", [], owner_id="bob")
+
+    stats = {s["source"]: s for s in store.source_stats("alice")}
+    assert {source: s["count"] for source, s in stats.items()} == {"Dune": 2, "Emma": 1}
+    assert stats["Dune"]["latest_created_at"] == second["created_at"]
+
+    store.update(second["id"], {"source": "Emma"}, owner_id="alice")
+    store.delete(first["id"], owner_id="alice")
+
+    assert {s["source"]: s["count"] for s in store.source_stats("alice")} == {"Emma": 2}
+    assert store.count("alice", source="Dune") == 0
+
+
+def test_source_filter_combines_with_tag_and_pages(store):
+    created = [
+        store.create(f"n{n}", "Dune", ["sf"] if n % 2 else [], owner_id="alice")
+        for n in range(5)
+    ]
+    store.create("other", "Emma", ["sf"], owner_id="alice")
+
+    assert [h["id"] for h in store.get_all(owner_id="alice", source="Dune")] == [
+        h["id"] for h in created
+    ]
+    assert store.count("alice", tag="sf", source="Dune") == 2
+    assert [
+        h["id"] for h in store.get_by_tag("sf", owner_id="alice", source="Dune")
+    ] == [created[1]["id"], created[3]["id"]]
+
+    page, has_more = store.get_page("alice", 1, tag="sf", source="Dune")
+    assert [h["id"] for h in page] == [created[3]["id"]]
+    assert has_more
+
+
+def test_created_range_is_bisected_in_every_index(store):
+    base = store.create("first", "Dune", ["sf"], owner_id="alice")["created_at"]
+    created = [base] + [
+        store.create(f"n{n}", "Dune", ["sf"], owner_id="alice")["created_at"]
+        for n in range(3)
+    ]
+    start, end = created[1], created[3]
+
+    in_range = store.get_all(owner_id="alice", created_from=start, created_to=end)
+    assert [h["created_at"] for h in in_range] == [
+        c for c in created if start <= c < end
+    ]
+    expected = len(in_range)
+    assert store.count("alice", created_from=start, created_to=end) == expected
+    assert (
+        store.count("alice", tag="sf", created_from=start, created_to=end) == expected
+    )
+    assert len(
+        store.get_by_tag("sf", owner_id="alice", source="Dune", created_from=start)
+    ) == sum(1 for c in created if c >= start)
+    page, _ = store.get_page("alice", 10, source="Dune", created_to=start)
+    assert [h["created_at"] for h in page] == [c for c in created if c < start][::-1]
+
+
+def test_owner_version_is_bumped_by_every_write(store):
+    seen = [store.version("alice")]
+
+    def changed():
+        seen.append(store.version("alice"))
+        return seen[-1] > seen[-2]
+
+    created = store.create("text", "src", ["tag"], owner_id="alice")
+    assert changed()
+    store.create_many([{"text": "b", "source": "src", "tags": []}], owner_id="alice")
+    assert changed()
+    store.update(created["id"], {"text": "new"})
+    assert changed()
+    store.rename_tag("alice", "tag", "renamed")
+    assert changed()
+    store.delete_by_tag("alice", "renamed")
+    assert changed()
+    store.get_all(owner_id="alice")
+    store.update(created["id"], {"text": "missing"})
+    store.remove_tag("alice", "unknown")
+    assert not changed()
+
+    store.reset_to_default()
+    assert changed()
+
+
+def test_recreated_store_does_not_repeat_owner_versions(store):
+    seen = {store.version("alice"), store.version("nobody")}
+    store.create("text", "src", [], owner_id="alice")
+    seen.add(store.version("alice"))
+
+    fresh = type(store)()
+    assert fresh.version("alice") not in seen
+    assert fresh.version("nobody") not in seen
+    fresh.create("text", "src", [], owner_id="alice")
+    assert fresh.version("alice") not in seen
+
+
+def test_reads_project_requested_fields(store):
+    created = store.create("text", "src", ["tag"], owner_id="alice")
+    fields = ("tags", "id")
+    expected = {"tags": ["tag"], "id": created["id"]}
+
+    assert store.get_all(owner_id="alice", fields=fields) == [expected]
+    assert store.get_by_tag("tag", owner_id="alice", fields=fields) == [expected]
+    assert store.get_page("alice", 10, fields=fields) == ([expected], False)
+    assert store.get_by_id(created["id"], fields=fields) == expected
+    assert store.get_by_id(created["id"], owner_id="bob", fields=fields) is None
+    assert list(store.get_by_id(created["id"], fields=("created_at",))) == [
+        "created_at"
+    ]
+    assert (
+        store.get_by_id(created["id"], fields=("created_at",))["created_at"]
+        == store.get_by_id(created["id"])["created_at"]
+    )